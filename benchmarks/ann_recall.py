@@ -0,0 +1,66 @@
+"""
+Recall vs latency of IVFIndex against exact VectorIndex search.
+
+Usage:
+    python benchmarks/ann_recall.py --rows 200000 --dim 384 --lists 512
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from rome.core.ann_index import IVFIndex  # noqa: E402
+from rome.core.vector_index import VectorIndex  # noqa: E402
+
+
+def clustered_data(rows: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    """Embeddings drawn around random topic centres, closer to real text than pure noise"""
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, rows)
+    return centres[labels] + 0.6 * rng.standard_normal((rows, dim)).astype(np.float32)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--lists", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--probes", type=str, default="1,2,4,8,16,32,64")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    data = clustered_data(args.rows, args.dim, max(16, args.lists // 2), rng)
+    queries = data[rng.choice(args.rows, args.queries, replace=False)]
+    queries = queries + 0.3 * rng.standard_normal(queries.shape).astype(np.float32)
+    items = [(i, data[i], None, None, True) for i in range(args.rows)]
+
+    exact = VectorIndex(dim=args.dim, capacity=args.rows)
+    exact.add_many(items)
+    started = time.perf_counter()
+    truth = [{id_ for id_, _ in exact.search(q, args.k)} for q in queries]
+    exact_ms = (time.perf_counter() - started) * 1000 / args.queries
+
+    started = time.perf_counter()
+    ann = IVFIndex(dim=args.dim, n_lists=args.lists, capacity=args.rows, train_size=args.rows)
+    ann.add_many(items)
+    build_s = time.perf_counter() - started
+
+    print(f"rows={args.rows} dim={args.dim} lists={args.lists} k={args.k} build={build_s:.1f}s")
+    print(f"{'n_probe':>8} {'recall@k':>9} {'ms/query':>9} {'speedup':>8}")
+    print(f"{'exact':>8} {1.0:>9.3f} {exact_ms:>9.3f} {1.0:>8.1f}")
+    for n_probe in (int(p) for p in args.probes.split(",")):
+        started = time.perf_counter()
+        found = [{id_ for id_, _ in ann.search(q, args.k, n_probe=n_probe)} for q in queries]
+        ms = (time.perf_counter() - started) * 1000 / args.queries
+        recall = np.mean([len(f & t) / len(t) for f, t in zip(found, truth)])
+        print(f"{n_probe:>8} {recall:>9.3f} {ms:>9.3f} {exact_ms / ms:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import asyncio
+from collections import OrderedDict
+import time
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from .types import Account, Actor, IDatabaseAdapter
+
+
+class ActorCache:
+    """
+    Runtime-level cache of room participants and their actor records.
+
+    Participant lists and accounts are cached separately, so an account shared
+    by many rooms is fetched once, and the accounts a room is missing are read
+    with a single `getAccountsByIds` call. Entries expire after `ttl` seconds.
+    Adapters with `add_invalidation_hook` (every DatabaseAdapter) drop entries
+    themselves when accounts or participants are written through them; for
+    other writers call `invalidate_room` / `invalidate_account` directly.
+    """
+
+    def __init__(self, adapter: IDatabaseAdapter, ttl: float = 300.0,
+                 max_rooms: int = 1024, max_accounts: int = 10000):
+        self.adapter = adapter
+        self.ttl = ttl
+        self.max_rooms = max_rooms
+        self.max_accounts = max_accounts
+        self._rooms: "OrderedDict[UUID, Tuple[float, List[UUID]]]" = OrderedDict()
+        self._accounts: "OrderedDict[UUID, Tuple[float, Optional[Account]]]" = OrderedDict()
+        self._inflight: Dict[UUID, asyncio.Task] = {}
+        self._pending_accounts: Dict[UUID, asyncio.Future] = {}
+        # Bumped on every invalidation so loads started earlier are not cached
+        self._generation = 0
+        add_hook = getattr(adapter, "add_invalidation_hook", None)
+        if add_hook is not None:
+            add_hook(self._on_write)
+
+    def _on_write(self, kind: str, id_: UUID) -> None:
+        if kind == 'room':
+            self.invalidate_room(id_)
+        elif kind == 'account':
+            self.invalidate_account(id_)
+
+    @staticmethod
+    def _lookup(entries: OrderedDict, key: UUID, now: float):
+        entry = entries.get(key)
+        if entry is None:
+            return False, None
+        expires, value = entry
+        if expires <= now:
+            del entries[key]
+            return False, None
+        entries.move_to_end(key)
+        return True, value
+
+    @staticmethod
+    def _store(entries: OrderedDict, key: UUID, value, expires: float, limit: int) -> None:
+        entries[key] = (expires, value)
+        entries.move_to_end(key)
+        while len(entries) > limit:
+            entries.popitem(last=False)
+
+    async def get_participants(self, room_id: UUID) -> List[UUID]:
+        found, participants = self._lookup(self._rooms, room_id, time.monotonic())
+        if found:
+            return participants
+        task = self._inflight.get(room_id)
+        if task is None:
+            task = asyncio.ensure_future(self._load_participants(room_id))
+            self._inflight[room_id] = task
+            task.add_done_callback(lambda done: self._release_room(room_id, done))
+        return await asyncio.shield(task)
+
+    def _release_room(self, room_id: UUID, task: asyncio.Future) -> None:
+        if self._inflight.get(room_id) is task:
+            del self._inflight[room_id]
+
+    async def _load_participants(self, room_id: UUID) -> List[UUID]:
+        generation = self._generation
+        participants = await self.adapter.getParticipantsForRoom(room_id)
+        if generation == self._generation:
+            self._store(self._rooms, room_id, participants,
+                        time.monotonic() + self.ttl, self.max_rooms)
+        return participants
+
+    async def get_accounts(self, user_ids: List[UUID]) -> Dict[UUID, Account]:
+        """Accounts for the given ids; unknown ids are left out"""
+        now = time.monotonic()
+        accounts: Dict[UUID, Account] = {}
+        waiting: Dict[UUID, asyncio.Future] = {}
+        missing: List[UUID] = []
+        for user_id in dict.fromkeys(user_ids):
+            found, account = self._lookup(self._accounts, user_id, now)
+            if found:
+                if account is not None:
+                    accounts[user_id] = account
+            elif user_id in self._pending_accounts:
+                waiting[user_id] = self._pending_accounts[user_id]
+            else:
+                missing.append(user_id)
+        if missing:
+            task = asyncio.ensure_future(self._load_accounts(missing))
+            for user_id in missing:
+                waiting[user_id] = self._pending_accounts[user_id] = task
+            task.add_done_callback(lambda _: self._release(missing, task))
+        for user_id, pending in waiting.items():
+            account = (await asyncio.shield(pending)).get(user_id)
+            if account is not None:
+                accounts[user_id] = account
+        return accounts
+
+    def _release(self, user_ids: List[UUID], task: asyncio.Future) -> None:
+        for user_id in user_ids:
+            if self._pending_accounts.get(user_id) is task:
+                del self._pending_accounts[user_id]
+
+    async def _load_accounts(self, user_ids: List[UUID]) -> Dict[UUID, Account]:
+        generation = self._generation
+        loaded = {account.id: account for account in await self.adapter.getAccountsByIds(user_ids)}
+        if generation == self._generation:
+            expires = time.monotonic() + self.ttl
+            for user_id in user_ids:
+                # Misses are cached too, so unknown participants do not hit the database every message
+                self._store(self._accounts, user_id, loaded.get(user_id), expires, self.max_accounts)
+        return loaded
+
+    async def get_actors(self, room_id: UUID) -> List[Actor]:
+        """Actors for every participant in the room that has an account"""
+        participants = await self.get_participants(room_id)
+        accounts = await self.get_accounts(participants)
+        return [
+            Actor(id=account.id, name=account.name, username=account.username, details=account.details)
+            for account in (accounts.get(user_id) for user_id in participants)
+            if account is not None
+        ]
+
+    def invalidate_room(self, room_id: UUID) -> None:
+        self._generation += 1
+        self._rooms.pop(room_id, None)
+        self._inflight.pop(room_id, None)
+
+    def invalidate_account(self, user_id: UUID) -> None:
+        self._generation += 1
+        self._accounts.pop(user_id, None)
+        self._pending_accounts.pop(user_id, None)
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._rooms.clear()
+        self._accounts.clear()
+        self._inflight.clear()
+        self._pending_accounts.clear()
@@ -0,0 +1,277 @@
+from typing import Hashable, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .vector_index import SCORE_BLOCK, VectorIndex, normalize, top_k
+
+
+def spherical_kmeans(vectors: np.ndarray, n_clusters: int, n_iter: int = 20,
+                     seed: int = 0) -> np.ndarray:
+    """Cluster unit vectors by cosine similarity, returning unit-length centroids"""
+    rng = np.random.default_rng(seed)
+    n_clusters = min(n_clusters, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        counts = np.bincount(assignment, minlength=n_clusters)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty clusters from random points so every list is used
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        centroids = normalize(sums)
+    return centroids
+
+
+class IVFFit(NamedTuple):
+    """Centroids fitted by IVFIndex.fit and the list of each row live at the time"""
+    size: int
+    compactions: int
+    centroids: np.ndarray
+    rows: np.ndarray
+    lists: np.ndarray
+
+
+class IVFIndex(VectorIndex):
+    """
+    Approximate cosine index (IVF-flat) for tables with millions of embeddings.
+
+    Rows are partitioned into `n_lists` inverted lists by nearest spherical
+    k-means centroid; a query only scores the rows of its `n_probe` closest
+    lists. Raising `n_probe` trades latency for recall (n_probe == n_lists is
+    exact). Until `train_size` rows exist the index answers exactly. Deletes
+    are tombstones, reclaimed by `compact()`.
+
+    `add_many` trains the index as soon as `train_size` is reached unless
+    `train_inline` is False. In that case the owner runs `fit()` in a worker
+    thread and applies the result with `install()`, and the index keeps
+    answering exactly until then.
+    """
+
+    def __init__(self, dim: Optional[int] = None, n_lists: int = 256, n_probe: int = 8,
+                 train_size: Optional[int] = None, capacity: int = 1024, seed: int = 0,
+                 dtype: str = 'float32', train_inline: bool = True):
+        self._alive = np.empty(0, dtype=bool)
+        super().__init__(dim=dim, capacity=capacity, dtype=dtype)
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.train_size = train_size if train_size is not None else max(1000, 16 * n_lists)
+        self.seed = seed
+        self.train_inline = train_inline
+        self.centroids: Optional[np.ndarray] = None
+        self._lists: List[List[np.ndarray]] = []
+        self.tombstones = 0
+        self._compactions = 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    @property
+    def needs_training(self) -> bool:
+        return not self.trained and len(self) >= self.train_size
+
+    def _allocate(self, dim: int, capacity: int) -> None:
+        super()._allocate(dim, capacity)
+        self._alive = np.zeros(capacity, dtype=bool)
+
+    def _grow(self, needed: int) -> None:
+        old = self._capacity
+        super()._grow(needed)
+        if self._capacity != old:
+            alive = np.zeros(self._capacity, dtype=bool)
+            alive[:old] = self._alive[:old]
+            self._alive = alive
+
+    def add_many(self, items: Iterable[Tuple[Hashable, Sequence[float], Optional[Hashable],
+                                             Optional[Hashable], bool]]) -> None:
+        items = list(items)
+        for item in items:
+            # Replaced rows are tombstoned so inverted list positions stay valid
+            self.remove(item[0])
+        start = self._size
+        super().add_many(items)
+        self._alive[start:self._size] = True
+        if self.trained:
+            self._assign(np.arange(start, self._size))
+        elif self.train_inline and self.needs_training:
+            self.train()
+
+    def remove(self, id_: Hashable) -> bool:
+        row = self._rows.pop(id_, None)
+        if row is None:
+            return False
+        self._alive[row] = False
+        self.tombstones += 1
+        return True
+
+    def _nearest(self, rows: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """Index of each row's closest centroid"""
+        if rows.size == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([
+            np.argmax(self._vectors(rows[start:start + SCORE_BLOCK]) @ centroids.T, axis=1)
+            for start in range(0, rows.size, SCORE_BLOCK)
+        ])
+
+    def _assign(self, rows: np.ndarray, lists: Optional[np.ndarray] = None) -> None:
+        if rows.size == 0:
+            return
+        if lists is None:
+            lists = self._nearest(rows, self.centroids)
+        order = np.argsort(lists, kind='stable')
+        bounds = np.flatnonzero(np.diff(lists[order])) + 1
+        for group in np.split(order, bounds):
+            chunks = self._lists[int(lists[group[0]])]
+            chunks.append(rows[group])
+            if len(chunks) > 16:
+                # Incremental inserts add tiny chunks; merge them so probes stay cheap
+                chunks[:] = [np.concatenate(chunks)]
+
+    def train(self, sample_size: int = 100000) -> None:
+        """Fit centroids on a sample of live rows and rebuild the inverted lists"""
+        fit = self.fit(sample_size)
+        if fit is not None:
+            self.install(fit)
+
+    def fit(self, sample_size: int = 100000) -> Optional[IVFFit]:
+        """
+        Fit centroids on a sample of the rows present now and find each row's
+        list, without modifying the index. Safe to run in a worker thread while
+        the event loop keeps adding to and searching the index.
+        """
+        size, compactions = self._size, self._compactions
+        live = np.flatnonzero(self._alive[:size])
+        if live.size == 0:
+            return None
+        rng = np.random.default_rng(self.seed)
+        sample = live if live.size <= sample_size else rng.choice(live, sample_size, replace=False)
+        centroids = spherical_kmeans(self._vectors(sample), self.n_lists, seed=self.seed)
+        return IVFFit(size, compactions, centroids, live, self._nearest(live, centroids))
+
+    def install(self, fit: IVFFit) -> bool:
+        """
+        Switch to approximate search with fitted centroids, assigning rows added
+        since the fit. Returns False, leaving the index untouched, if a
+        compaction has since moved the rows.
+        """
+        if fit.compactions != self._compactions:
+            return False
+        self.centroids = fit.centroids
+        self._lists = [[] for _ in range(len(fit.centroids))]
+        # Rows removed since the fit stay in the lists; search filters them out
+        self._assign(fit.rows, fit.lists)
+        self._assign(np.arange(fit.size, self._size))
+        return True
+
+    def compact(self) -> int:
+        """Drop tombstoned rows and rebuild the lists, returning rows reclaimed"""
+        live = np.flatnonzero(self._alive[:self._size])
+        reclaimed = self._size - live.size
+        if reclaimed == 0:
+            return 0
+        self._matrix[:live.size] = self._matrix[live]
+        self._scales[:live.size] = self._scales[live]
+        self._rooms[:live.size] = self._rooms[live]
+        self._agents[:live.size] = self._agents[live]
+        self._unique[:live.size] = self._unique[live]
+        self._ids = [self._ids[row] for row in live]
+        self._rows = {id_: row for row, id_ in enumerate(self._ids)}
+        self._size = live.size
+        self._alive[:] = False
+        self._alive[:self._size] = True
+        self.tombstones = 0
+        self._compactions += 1
+        if self.trained:
+            self._lists = [[] for _ in range(len(self.centroids))]
+            self._assign(np.arange(self._size))
+        return reclaimed
+
+    def _candidates(self, q: np.ndarray, n_probe: int) -> np.ndarray:
+        if not self.trained:
+            return np.arange(self._size)
+        probe = top_k(self.centroids @ q, min(n_probe, len(self.centroids)))
+        chunks = [chunk for list_id in probe for chunk in self._lists[list_id]]
+        if not chunks:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(chunks)
+
+    def search(self, query: Sequence[float], k: int = 10, room_id: Optional[Hashable] = None,
+               agent_id: Optional[Hashable] = None, threshold: Optional[float] = None,
+               unique: bool = False, n_probe: Optional[int] = None,
+               candidates: Optional[Iterable[Hashable]] = None) -> List[Tuple[Hashable, float]]:
+        if candidates is not None:
+            # An explicit candidate set is scored exactly; tombstoned rows are never candidates
+            return super().search(query, k, room_id, agent_id, threshold, unique, candidates=candidates)
+        if len(self) == 0:
+            return []
+        q = normalize(np.asarray(query, dtype=np.float32))
+        if q.shape[0] != self.dim:
+            raise ValueError(f"Query dimension {q.shape[0]} does not match index dimension {self.dim}")
+        rows = self._candidates(q, n_probe or self.n_probe)
+        keep = self._alive[rows]
+        mask = self._mask(room_id, agent_id, unique)
+        if mask is not None:
+            keep &= mask[rows]
+        rows = rows[keep]
+        if rows.size == 0:
+            return []
+        scores = self._score(q, rows)
+        if threshold is not None:
+            above = scores >= threshold
+            rows, scores = rows[above], scores[above]
+        best = top_k(scores, k)
+        return [(self._ids[rows[b]], float(scores[b])) for b in best]
+
+    def save(self, path: str) -> None:
+        """Write the index to a .npz file; ids and labels must be strings"""
+        live = np.flatnonzero(self._alive[:self._size])
+        room_labels = self._room_codes.labels()
+        agent_labels = self._agent_codes.labels()
+        np.savez(
+            path,
+            matrix=self._matrix[live],
+            scales=self._scales[live],
+            dtype=np.array(self.dtype),
+            ids=np.array([str(self._ids[row]) for row in live]),
+            rooms=self._rooms[live],
+            agents=self._agents[live],
+            unique=self._unique[live],
+            room_labels=np.array([str(label) for label in room_labels]),
+            agent_labels=np.array([str(label) for label in agent_labels]),
+            centroids=self.centroids if self.trained else np.empty((0, self.dim or 0), dtype=np.float32),
+            params=np.array([self.n_lists, self.n_probe, self.train_size, self.seed])
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        data = np.load(path)
+        n_lists, n_probe, train_size, seed = (int(v) for v in data['params'])
+        matrix = data['matrix']
+        index = cls(dim=matrix.shape[1], n_lists=n_lists, n_probe=n_probe,
+                    train_size=train_size, capacity=max(len(matrix), 1), seed=seed,
+                    dtype=str(data['dtype']))
+        for label in data['room_labels']:
+            index._room_codes.encode(str(label))
+        for label in data['agent_labels']:
+            index._agent_codes.encode(str(label))
+        size = len(matrix)
+        # Rows were normalised and quantized when first added, so they are copied in as-is
+        index._matrix[:size] = matrix
+        index._scales[:size] = data['scales']
+        index._rooms[:size] = data['rooms']
+        index._agents[:size] = data['agents']
+        index._unique[:size] = data['unique']
+        index._alive[:size] = True
+        index._ids = [str(id_) for id_ in data['ids']]
+        index._rows = {id_: row for row, id_ in enumerate(index._ids)}
+        index._size = size
+        if len(data['centroids']):
+            index.centroids = data['centroids']
+            index._lists = [[] for _ in range(len(index.centroids))]
+            index._assign(np.arange(size))
+        return index
@@ -1,100 +1,855 @@
 from abc import ABC, abstractmethod
+import asyncio
+import base64
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import hashlib
+import heapq
 import json
 import os
+import sys
+import tempfile
+import time
+import zlib
 from pathlib import Path
-from typing import Any, Optional, TypeVar, Generic
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar, Generic, Union
 from uuid import UUID
 
 from .types import ICacheManager, IDatabaseCacheAdapter, CacheOptions
+from .logger import rome_logger
+from .cache_codec import (
+    DEFAULT_CODECS, Envelope, ICacheCodec, decode_envelope, encode_envelope, peek_expires
+)
+
+# Adapters store legacy JSON envelopes as str and versioned envelopes as bytes
+CacheValue = Union[str, bytes]
 
 
 T = TypeVar('T')
 
 class ICacheAdapter(ABC):
     @abstractmethod
-    async def get(self, key: str) -> Optional[str]:
+    async def get(self, key: str) -> Optional[CacheValue]:
         pass
         
     @abstractmethod
-    async def set(self, key: str, value: str) -> None:
+    async def set(self, key: str, value: CacheValue) -> None:
         pass
         
     @abstractmethod
     async def delete(self, key: str) -> None:
         pass
 
+    async def get_many(self, keys: List[str]) -> Dict[str, CacheValue]:
+        """Get several keys at once; missing keys are omitted from the result"""
+        values = await asyncio.gather(*[self.get(key) for key in keys])
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    async def set_many(self, entries: Dict[str, CacheValue]) -> None:
+        await asyncio.gather(*[self.set(key, value) for key, value in entries.items()])
+
+    async def delete_many(self, keys: List[str]) -> None:
+        await asyncio.gather(*[self.delete(key) for key in keys])
+
+    async def peek_many(self, keys: List[str]) -> Dict[str, CacheValue]:
+        """
+        Stored values for housekeeping reads such as the expiry sweep. Adapters
+        that keep hit/miss counters or expire entries on read override this to
+        do neither.
+        """
+        return await self.get_many(keys)
+
+@dataclass
+class CacheStats:
+    """Snapshot of cache adapter counters"""
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    entries: int = 0
+    bytes: int = 0
+
+class ExpiryIndex:
+    """Min-heap of key expiry times with lazy invalidation of overwritten keys"""
+
+    def __init__(self):
+        self._heap: List[Tuple[float, str]] = []
+        self._expires: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._expires)
+
+    def get(self, key: str) -> Optional[float]:
+        return self._expires.get(key)
+
+    def add(self, key: str, expires: float) -> None:
+        if not expires:
+            self.discard(key)
+            return
+        self._expires[key] = expires
+        heapq.heappush(self._heap, (expires, key))
+        # Drop stale heap entries so the heap does not outgrow the live keys
+        if len(self._heap) > 2 * len(self._expires) + 64:
+            self._heap = [(e, k) for e, k in self._heap if self._expires.get(k) == e]
+            heapq.heapify(self._heap)
+
+    def discard(self, key: str) -> None:
+        self._expires.pop(key, None)
+
+    def next_expiry(self) -> Optional[float]:
+        while self._heap:
+            expires, key = self._heap[0]
+            if self._expires.get(key) == expires:
+                return expires
+            heapq.heappop(self._heap)
+        return None
+
+    def pop_due(self, now: Optional[float] = None, limit: Optional[int] = None) -> List[str]:
+        """Remove and return keys whose expiry is at or before `now`"""
+        now = time.time() if now is None else now
+        due = []
+        while self._heap and self._heap[0][0] <= now and (limit is None or len(due) < limit):
+            expires, key = heapq.heappop(self._heap)
+            if self._expires.get(key) == expires:
+                del self._expires[key]
+                due.append(key)
+        return due
+
+    def clear(self) -> None:
+        self._heap.clear()
+        self._expires.clear()
+
 class MemoryCacheAdapter(ICacheAdapter):
-    def __init__(self, initial_data: dict = None):
-        self.data = initial_data or {}
-        
-    async def get(self, key: str) -> Optional[str]:
-        return self.data.get(key)
+    """
+    In-process cache adapter.
+
+    Unbounded by default. When `max_entries` or `max_bytes` is set, entries are
+    kept in LRU order and evicted once a limit is exceeded; entries whose
+    CacheManager envelope has already expired are reclaimed before live ones.
+    """
+
+    def __init__(self, initial_data: dict = None,
+                 max_entries: Optional[int] = None,
+                 max_bytes: Optional[int] = None):
+        self.data: "OrderedDict[str, CacheValue]" = OrderedDict()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._sizes: Dict[str, int] = {}
+        self._expiry = ExpiryIndex()
+        for key, value in (initial_data or {}).items():
+            self._store(key, value)
+        self._enforce_limits()
+
+    @property
+    def bounded(self) -> bool:
+        return self.max_entries is not None or self.max_bytes is not None
+
+    async def get(self, key: str) -> Optional[CacheValue]:
+        value = self.data.get(key)
+        if value is None:
+            self.stats.misses += 1
+            return None
+        expires = self._expiry.get(key)
+        if expires and expires <= time.time():
+            self._remove(key)
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return None
+        self.data.move_to_end(key)
+        self.stats.hits += 1
+        return value
         
-    async def set(self, key: str, value: str) -> None:
-        self.data[key] = value
+    async def set(self, key: str, value: CacheValue) -> None:
+        self._store(key, value)
+        self._enforce_limits()
+
+    async def peek_many(self, keys: List[str]) -> Dict[str, CacheValue]:
+        return {key: self.data[key] for key in keys if key in self.data}
         
     async def delete(self, key: str) -> None:
-        self.data.pop(key, None)
+        self._remove(key)
+
+    async def get_many(self, keys: List[str]) -> Dict[str, CacheValue]:
+        result = {}
+        for key in keys:
+            value = await self.get(key)
+            if value is not None:
+                result[key] = value
+        return result
+
+    async def set_many(self, entries: Dict[str, CacheValue]) -> None:
+        for key, value in entries.items():
+            self._store(key, value)
+        self._enforce_limits()
+
+    async def delete_many(self, keys: List[str]) -> None:
+        for key in keys:
+            self._remove(key)
+
+    def get_stats(self) -> CacheStats:
+        """Return a copy of the current counters"""
+        return CacheStats(
+            hits=self.stats.hits,
+            misses=self.stats.misses,
+            evictions=self.stats.evictions,
+            expirations=self.stats.expirations,
+            entries=len(self.data),
+            bytes=self.stats.bytes
+        )
+
+    def clear(self) -> None:
+        self.data.clear()
+        self._sizes.clear()
+        self._expiry.clear()
+        self.stats.bytes = 0
+        self.stats.entries = 0
+
+    def _store(self, key: str, value: CacheValue) -> None:
+        if key in self.data:
+            self._remove(key)
+        size = sys.getsizeof(key) + sys.getsizeof(value)
+        self.data[key] = value
+        self._sizes[key] = size
+        self.stats.bytes += size
+        self.stats.entries = len(self.data)
+        expires = peek_expires(value)
+        if expires:
+            self._expiry.add(key, expires)
+
+    def _remove(self, key: str) -> bool:
+        if self.data.pop(key, None) is None:
+            return False
+        self.stats.bytes -= self._sizes.pop(key, 0)
+        self._expiry.discard(key)
+        self.stats.entries = len(self.data)
+        return True
+
+    def _over_limits(self) -> bool:
+        if self.max_entries is not None and len(self.data) > self.max_entries:
+            return True
+        return self.max_bytes is not None and self.stats.bytes > self.max_bytes
+
+    def _enforce_limits(self) -> None:
+        if not self.bounded:
+            return
+        now = time.time()
+        # Reclaim already-expired entries first, cheapest via the expiry index
+        while self._over_limits():
+            due = self._expiry.pop_due(now, limit=1)
+            if not due:
+                break
+            if self._remove(due[0]):
+                self.stats.expirations += 1
+        while self._over_limits() and self.data:
+            key = next(iter(self.data))
+            self._remove(key)
+            self.stats.evictions += 1
+
+    def sweep_expired(self, limit: Optional[int] = None) -> int:
+        """Drop entries past their envelope expiry, returning how many were removed"""
+        removed = 0
+        for key in self._expiry.pop_due(limit=limit):
+            if self._remove(key):
+                removed += 1
+        self.stats.expirations += removed
+        return removed
 
 class FsCacheAdapter(ICacheAdapter):
-    def __init__(self, data_dir: str):
+    """
+    Filesystem cache adapter.
+
+    Keys are hashed into sharded subdirectories, writes go to a temp file that is
+    atomically renamed into place, and all file I/O runs on a bounded thread
+    pool so the event loop never blocks on disk.
+    """
+
+    _RAW = b'\x00'
+    _ZLIB = b'\x01'
+    _RAW_BYTES = b'\x02'
+    _ZLIB_BYTES = b'\x03'
+
+    def __init__(self, data_dir: str, max_workers: int = 4, shard_depth: int = 2,
+                 compress_threshold: Optional[int] = None, compress_level: int = 6,
+                 fsync: bool = False):
         self.data_dir = Path(data_dir)
+        self.shard_depth = shard_depth
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+        self.fsync = fsync
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="rome-fs-cache")
+
+    def _path(self, key: str) -> Path:
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        shards = [digest[i * 2:i * 2 + 2] for i in range(self.shard_depth)]
+        return self.data_dir.joinpath(*shards, digest)
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def _encode(self, value: CacheValue) -> bytes:
+        is_bytes = isinstance(value, bytes)
+        raw = value if is_bytes else value.encode('utf-8')
+        if self.compress_threshold is not None and len(raw) >= self.compress_threshold:
+            return (self._ZLIB_BYTES if is_bytes else self._ZLIB) + zlib.compress(raw, self.compress_level)
+        return (self._RAW_BYTES if is_bytes else self._RAW) + raw
+
+    @classmethod
+    def _decode(cls, blob: bytes) -> Optional[CacheValue]:
+        flag, body = blob[:1], blob[1:]
+        if flag == cls._ZLIB:
+            return zlib.decompress(body).decode('utf-8')
+        if flag == cls._RAW:
+            return body.decode('utf-8')
+        if flag == cls._ZLIB_BYTES:
+            return zlib.decompress(body)
+        if flag == cls._RAW_BYTES:
+            return body
+        return None
+
+    def _read(self, key: str) -> Optional[CacheValue]:
+        try:
+            return self._decode(self._path(key).read_bytes())
+        except FileNotFoundError:
+            return None
+
+    def _write(self, key: str, value: CacheValue) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix='.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self._encode(value))
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _unlink(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
+
+    def _chunks(self, items: List[Any]) -> List[List[Any]]:
+        """Split a batch so it is spread across the worker threads"""
+        size = max(1, -(-len(items) // self.max_workers))
+        return [items[i:i + size] for i in range(0, len(items), size)]
+
+    def _read_chunk(self, keys: List[str]) -> Dict[str, CacheValue]:
+        result = {}
+        for key in keys:
+            value = self._read(key)
+            if value is not None:
+                result[key] = value
+        return result
+
+    def _write_chunk(self, entries: List[Tuple[str, CacheValue]]) -> None:
+        for key, value in entries:
+            self._write(key, value)
+
+    def _unlink_chunk(self, keys: List[str]) -> None:
+        for key in keys:
+            self._unlink(key)
         
-    async def get(self, key: str) -> Optional[str]:
+    async def get(self, key: str) -> Optional[CacheValue]:
         try:
-            path = self.data_dir / key
-            return await path.read_text()
-        except:
+            return await self._run(self._read, key)
+        except Exception as e:
+            rome_logger.error(f"Cache read error: {e}")
             return None
             
-    async def set(self, key: str, value: str) -> None:
+    async def set(self, key: str, value: CacheValue) -> None:
         try:
-            path = self.data_dir / key
-            path.parent.mkdir(parents=True, exist_ok=True)
-            await path.write_text(value)
+            await self._run(self._write, key, value)
         except Exception as e:
-            print(f"Cache write error: {e}")
+            rome_logger.error(f"Cache write error: {e}")
             
     async def delete(self, key: str) -> None:
         try:
-            path = self.data_dir / key
-            path.unlink(missing_ok=True)
-        except:
-            pass
+            await self._run(self._unlink, key)
+        except Exception as e:
+            rome_logger.error(f"Cache delete error: {e}")
+
+    async def get_many(self, keys: List[str]) -> Dict[str, CacheValue]:
+        try:
+            parts = await asyncio.gather(*[
+                self._run(self._read_chunk, chunk) for chunk in self._chunks(list(keys))
+            ])
+        except Exception as e:
+            rome_logger.error(f"Cache read error: {e}")
+            return {}
+        result = {}
+        for part in parts:
+            result.update(part)
+        return result
+
+    async def set_many(self, entries: Dict[str, CacheValue]) -> None:
+        try:
+            await asyncio.gather(*[
+                self._run(self._write_chunk, chunk) for chunk in self._chunks(list(entries.items()))
+            ])
+        except Exception as e:
+            rome_logger.error(f"Cache write error: {e}")
+
+    async def delete_many(self, keys: List[str]) -> None:
+        try:
+            await asyncio.gather(*[
+                self._run(self._unlink_chunk, chunk) for chunk in self._chunks(list(keys))
+            ])
+        except Exception as e:
+            rome_logger.error(f"Cache delete error: {e}")
+
+    def close(self) -> None:
+        """Wait for pending file operations and release the worker threads"""
+        self._executor.shutdown(wait=True)
 
 class DbCacheAdapter(ICacheAdapter):
+    """Stores cache entries through IDatabaseCacheAdapter; binary values are base64 text"""
+
+    _BINARY_PREFIX = 'b64:'
+
     def __init__(self, db: IDatabaseCacheAdapter, agent_id: UUID):
         self.db = db
         self.agent_id = agent_id
+
+    @classmethod
+    def _to_db(cls, value: CacheValue) -> str:
+        if isinstance(value, bytes):
+            return cls._BINARY_PREFIX + base64.b64encode(value).decode('ascii')
+        return value
+
+    @classmethod
+    def _from_db(cls, value: Optional[str]) -> Optional[CacheValue]:
+        if value is not None and value.startswith(cls._BINARY_PREFIX):
+            return base64.b64decode(value[len(cls._BINARY_PREFIX):])
+        return value
         
-    async def get(self, key: str) -> Optional[str]:
-        return await self.db.getCache(self.agent_id, key)
+    async def get(self, key: str) -> Optional[CacheValue]:
+        return self._from_db(await self.db.getCache(self.agent_id, key))
         
-    async def set(self, key: str, value: str) -> None:
-        await self.db.setCache(self.agent_id, key, value)
+    async def set(self, key: str, value: CacheValue) -> None:
+        await self.db.setCache(self.agent_id, key, self._to_db(value))
         
     async def delete(self, key: str) -> None:
         await self.db.deleteCache(self.agent_id, key)
 
+    async def get_many(self, keys: List[str]) -> Dict[str, CacheValue]:
+        found = await self.db.getCacheMany(self.agent_id, keys)
+        return {key: self._from_db(value) for key, value in found.items()}
+
+    async def set_many(self, entries: Dict[str, CacheValue]) -> None:
+        await self.db.setCacheMany(self.agent_id, {
+            key: self._to_db(value) for key, value in entries.items()
+        })
+
+    async def delete_many(self, keys: List[str]) -> None:
+        await self.db.deleteCacheMany(self.agent_id, keys)
+
+class TieredCacheAdapter(ICacheAdapter):
+    """
+    Two-tier cache: a bounded in-process L1 in front of a slower L2 such as
+    FsCacheAdapter or DbCacheAdapter.
+
+    Reads go to L1 first and fall through to L2, promoting hits into L1. With
+    `write_behind` enabled, L2 writes are queued and flushed in batches by a
+    background task; call `flush()` or `close()` before shutdown.
+    """
+
+    _DELETED = object()
+
+    def __init__(self, l2: ICacheAdapter, l1: Optional[MemoryCacheAdapter] = None,
+                 write_behind: bool = False, batch_size: int = 100,
+                 flush_interval: float = 0.05, max_pending: int = 10000):
+        self.l1 = l1 if l1 is not None else MemoryCacheAdapter(max_entries=10000)
+        self.l2 = l2
+        self.write_behind = write_behind
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: "OrderedDict[str, Any]" = OrderedDict()
+        # Batch currently being written to L2; stays readable until the write completes
+        self._inflight: Dict[str, Any] = {}
+        # Bumped on every write so an L2 read that raced a write is not promoted into L1
+        self._version = 0
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def _queued(self, key: str) -> Tuple[bool, Any]:
+        """A write for `key` not yet in L2: (found, value or _DELETED)"""
+        if key in self._pending:
+            return True, self._pending[key]
+        if key in self._inflight:
+            return True, self._inflight[key]
+        return False, None
+
+    async def get(self, key: str) -> Optional[CacheValue]:
+        value = await self.l1.get(key)
+        if value is not None:
+            return value
+        queued, pending = self._queued(key)
+        if queued:
+            return None if pending is self._DELETED else pending
+        version = self._version
+        value = await self.l2.get(key)
+        if value is not None and version == self._version:
+            await self.l1.set(key, value)
+        return value
+
+    async def set(self, key: str, value: CacheValue) -> None:
+        self._version += 1
+        await self.l1.set(key, value)
+        if self.write_behind:
+            await self._enqueue(key, value)
+        else:
+            await self.l2.set(key, value)
+
+    async def delete(self, key: str) -> None:
+        self._version += 1
+        await self.l1.delete(key)
+        if self.write_behind:
+            await self._enqueue(key, self._DELETED)
+        else:
+            await self.l2.delete(key)
+
+    async def get_many(self, keys: List[str]) -> Dict[str, CacheValue]:
+        result = await self.l1.get_many(keys)
+        missing = []
+        for key in keys:
+            if key in result:
+                continue
+            queued, pending = self._queued(key)
+            if not queued:
+                missing.append(key)
+            elif pending is not self._DELETED:
+                result[key] = pending
+        if missing:
+            version = self._version
+            found = await self.l2.get_many(missing)
+            if found:
+                if version == self._version:
+                    await self.l1.set_many(found)
+                result.update(found)
+        return result
+
+    async def peek_many(self, keys: List[str]) -> Dict[str, CacheValue]:
+        result = await self.l1.peek_many(keys)
+        missing = []
+        for key in keys:
+            if key in result:
+                continue
+            queued, pending = self._queued(key)
+            if not queued:
+                missing.append(key)
+            elif pending is not self._DELETED:
+                result[key] = pending
+        if missing:
+            result.update(await self.l2.peek_many(missing))
+        return result
+
+    async def set_many(self, entries: Dict[str, CacheValue]) -> None:
+        self._version += 1
+        await self.l1.set_many(entries)
+        if self.write_behind:
+            for key, value in entries.items():
+                await self._enqueue(key, value)
+        else:
+            await self.l2.set_many(entries)
+
+    async def delete_many(self, keys: List[str]) -> None:
+        self._version += 1
+        await self.l1.delete_many(keys)
+        if self.write_behind:
+            for key in keys:
+                await self._enqueue(key, self._DELETED)
+        else:
+            await self.l2.delete_many(keys)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def _enqueue(self, key: str, value: Any) -> None:
+        self._pending.pop(key, None)
+        self._pending[key] = value
+        if len(self._pending) >= self.max_pending:
+            # Apply backpressure instead of letting the queue grow unbounded
+            await self.flush()
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        while self._pending:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self) -> int:
+        """Write all queued entries through to L2, returning how many were flushed"""
+        flushed = 0
+        async with self._flush_lock:
+            while self._pending:
+                batch = []
+                while self._pending and len(batch) < self.batch_size:
+                    batch.append(self._pending.popitem(last=False))
+                self._inflight.update(batch)
+                try:
+                    await self._write_batch(batch)
+                    flushed += len(batch)
+                except Exception as e:
+                    rome_logger.error(f"Cache write-behind flush error: {e}")
+                    for key, value in batch:
+                        self._pending.setdefault(key, value)
+                    break
+                finally:
+                    self._inflight.clear()
+        return flushed
+
+    async def _write_batch(self, batch: List[Tuple[str, Any]]) -> None:
+        writes = {key: value for key, value in batch if value is not self._DELETED}
+        deletes = [key for key, value in batch if value is self._DELETED]
+        if writes:
+            await self.l2.set_many(writes)
+        if deletes:
+            await self.l2.delete_many(deletes)
+
+    async def close(self) -> None:
+        """Flush queued writes and stop the background flusher"""
+        await self.flush()
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        self._flush_task = None
+
 class CacheManager(Generic[T], ICacheManager):
-    def __init__(self, adapter: ICacheAdapter):
+    """
+    Typed cache over an ICacheAdapter with expiry envelopes.
+
+    Without a `codec`, values are written as legacy JSON `{'value', 'expires'}`
+    strings. With a codec (e.g. PickleCodec) they are written as versioned
+    binary envelopes, zlib-compressed once the payload reaches
+    `compress_threshold` bytes. Both formats are readable, but versioned
+    envelopes only decode with JSON, the manager's own `codec` or those in
+    `read_codecs`; entries written with any other codec are treated as misses.
+    In particular pickled entries are never read unless PickleCodec is configured.
+    """
+
+    def __init__(self, adapter: ICacheAdapter, codec: Optional[ICacheCodec] = None,
+                 compress_threshold: Optional[int] = None,
+                 read_codecs: Optional[List[ICacheCodec]] = None):
         self.adapter = adapter
-        
-    async def get(self, key: str) -> Optional[T]:
+        self.codec = codec
+        self.compress_threshold = compress_threshold
+        self._codecs: Dict[int, ICacheCodec] = {
+            **DEFAULT_CODECS,
+            **{extra.codec_id: extra for extra in read_codecs or []},
+        }
+        if codec is not None:
+            self._codecs[codec.codec_id] = codec
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.expiry_index = ExpiryIndex()
+        self.reclaimed = 0
+        self._sweeper: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _expires_for(opts: Optional[CacheOptions]) -> float:
+        if not opts:
+            return 0
+        if opts.ttl:
+            return time.time() + opts.ttl
+        return opts.expires or 0
+
+    def _encode(self, value: Any, expires: float, refresh: Optional[float] = None) -> CacheValue:
+        if self.codec is not None:
+            return encode_envelope(self.codec, value, expires, refresh or 0,
+                                   compress_threshold=self.compress_threshold)
+        data = {'value': value}
+        if refresh:
+            data['refresh'] = refresh
+        data['expires'] = expires
+        return json.dumps(data)
+
+    def _decode(self, data: CacheValue) -> Optional[Envelope]:
+        try:
+            return decode_envelope(data, self._codecs)
+        except ValueError as error:
+            rome_logger.warning(f"Ignoring undecodable cache entry: {error}")
+            return None
+
+    async def _read(self, key: str) -> Optional[Envelope]:
+        """Return the stored envelope, deleting it if it is past its hard expiry"""
         data = await self.adapter.get(key)
         if data:
-            parsed = json.loads(data)
-            if not parsed['expires'] or parsed['expires'] > time.time():
-                return parsed['value']
+            expires = peek_expires(data)
+            if not expires or expires > time.time():
+                return self._decode(data)
             await self.delete(key)
         return None
+        
+    async def get(self, key: str) -> Optional[T]:
+        envelope = await self._read(key)
+        return envelope.value if envelope else None
             
     async def set(self, key: str, value: T, opts: Optional[CacheOptions] = None) -> None:
-        data = {
-            'value': value,
-            'expires': opts.expires if opts else 0
-        }
-        await self.adapter.set(key, json.dumps(data))
+        expires = self._expires_for(opts)
+        await self.adapter.set(key, self._encode(value, expires))
+        self.expiry_index.add(key, expires)
         
     async def delete(self, key: str) -> None:
-        await self.adapter.delete(key)
\ No newline at end of file
+        await self.adapter.delete(key)
+        self.expiry_index.discard(key)
+
+    async def get_many(self, keys: List[str]) -> Dict[str, T]:
+        """Get several keys in one adapter round trip; missing or expired keys are omitted"""
+        raw = await self.adapter.get_many(keys)
+        result = {}
+        expired = []
+        now = time.time()
+        for key, data in raw.items():
+            if not data:
+                continue
+            expires = peek_expires(data)
+            if expires and expires <= now:
+                expired.append(key)
+                continue
+            envelope = self._decode(data)
+            if envelope is not None:
+                result[key] = envelope.value
+        if expired:
+            await self.delete_many(expired)
+        return result
+
+    async def set_many(self, entries: Dict[str, T], opts: Optional[CacheOptions] = None) -> None:
+        expires = self._expires_for(opts)
+        await self.adapter.set_many({
+            key: self._encode(value, expires)
+            for key, value in entries.items()
+        })
+        for key in entries:
+            self.expiry_index.add(key, expires)
+
+    async def delete_many(self, keys: List[str]) -> None:
+        await self.adapter.delete_many(keys)
+        for key in keys:
+            self.expiry_index.discard(key)
+
+    async def get_or_compute(self, key: str, factory: Callable[[], Awaitable[T]],
+                             opts: Optional[CacheOptions] = None,
+                             stale_while_revalidate: Optional[float] = None) -> Optional[T]:
+        """
+        Return the cached value for `key`, computing it with `factory` on a miss.
+
+        Concurrent callers for the same key share a single in-flight computation.
+        With `stale_while_revalidate` (seconds), an entry past its expiry is still
+        served for that long while one background refresh replaces it. A factory
+        result of None is returned but not cached.
+        """
+        envelope = await self._read(key)
+        if envelope:
+            if not envelope.refresh or envelope.refresh > time.time():
+                return envelope.value
+            self._compute(key, factory, opts, stale_while_revalidate)
+            return envelope.value
+        return await asyncio.shield(self._compute(key, factory, opts, stale_while_revalidate))
+
+    def _compute(self, key: str, factory: Callable[[], Awaitable[T]],
+                 opts: Optional[CacheOptions],
+                 stale_while_revalidate: Optional[float]) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is not None:
+            return task
+
+        async def run() -> Optional[T]:
+            value = await factory()
+            if value is not None:
+                expires = self._expires_for(opts)
+                if stale_while_revalidate and expires:
+                    refresh, expires = expires, expires + stale_while_revalidate
+                    encoded = self._encode(value, expires, refresh=refresh)
+                else:
+                    encoded = self._encode(value, expires)
+                await self.adapter.set(key, encoded)
+                self.expiry_index.add(key, expires)
+            return value
+
+        def done(finished: asyncio.Task) -> None:
+            if self._inflight.get(key) is finished:
+                del self._inflight[key]
+            if not finished.cancelled() and finished.exception() is not None:
+                rome_logger.error(f"Cache compute error for {key}: {finished.exception()}")
+
+        task = asyncio.ensure_future(run())
+        self._inflight[key] = task
+        task.add_done_callback(done)
+        return task
+
+    async def sweep_expired(self, batch_size: int = 500) -> int:
+        """
+        Delete up to `batch_size` entries whose expiry has passed.
+
+        Only keys written through this manager since it was created are tracked.
+        Each due key's stored expiry is re-read first with `peek_many`, which
+        leaves hit/miss statistics alone, so an entry another writer has since
+        refreshed is rescheduled rather than deleted. Returns the number of
+        entries reclaimed.
+        """
+        due = self.expiry_index.pop_due(limit=batch_size)
+        if not due:
+            return 0
+        stored = await self.adapter.peek_many(due)
+        now = time.time()
+        expired = []
+        for key in due:
+            data = stored.get(key)
+            if data is None:
+                continue
+            expires = peek_expires(data)
+            if expires and expires <= now:
+                expired.append(key)
+            elif expires:
+                self.expiry_index.add(key, expires)
+        if expired:
+            await self.adapter.delete_many(expired)
+            self.reclaimed += len(expired)
+        return len(expired)
+
+    def start_sweeper(self, interval: float = 30.0, batch_size: int = 500) -> asyncio.Task:
+        """Start a background task that reclaims expired entries every `interval` seconds"""
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep_loop(interval, batch_size))
+        return self._sweeper
+
+    async def _sweep_loop(self, interval: float, batch_size: int) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            reclaimed = 0
+            try:
+                while True:
+                    count = await self.sweep_expired(batch_size)
+                    reclaimed += count
+                    if count < batch_size:
+                        break
+                    # Yield between batches so a large backlog does not starve the loop
+                    await asyncio.sleep(0)
+            except Exception as e:
+                rome_logger.error(f"Cache sweeper error: {e}")
+            if reclaimed:
+                rome_logger.debug(f"Cache sweeper reclaimed {reclaimed} expired entries")
+
+    async def stop_sweeper(self) -> None:
+        if self._sweeper is not None and not self._sweeper.done():
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+        self._sweeper = None
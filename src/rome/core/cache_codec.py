@@ -0,0 +1,136 @@
+from abc import ABC, abstractmethod
+import json
+import pickle
+import struct
+import zlib
+from typing import Any, Dict, NamedTuple, Optional, Union
+
+# Versioned envelope header:
+#   magic (2s) | version (B) | codec id (B) | flags (B) | expires (d) | refresh (d)
+# Entries without the magic prefix are legacy JSON `{'value', 'expires'}` strings.
+ENVELOPE_MAGIC = b'RC'
+ENVELOPE_VERSION = 1
+FLAG_ZLIB = 0x01
+
+_HEADER = struct.Struct('>2sBBBdd')
+HEADER_SIZE = _HEADER.size
+
+
+class ICacheCodec(ABC):
+    """Serializes cached values to bytes"""
+    codec_id: int = 0
+
+    @abstractmethod
+    def encode(self, value: Any) -> bytes:
+        pass
+
+    @abstractmethod
+    def decode(self, data: bytes) -> Any:
+        pass
+
+
+def _json_default(value: Any) -> Any:
+    # Array-like values such as CompactEmbedding are stored as plain lists
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class JsonCodec(ICacheCodec):
+    """UTF-8 JSON; portable, limited to JSON-compatible values"""
+    codec_id = 1
+
+    def encode(self, value: Any) -> bytes:
+        return json.dumps(value, separators=(',', ':'), default=_json_default).encode('utf-8')
+
+    def decode(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class PickleCodec(ICacheCodec):
+    """
+    Compact binary encoding that also holds bytes, dataclasses and arrays.
+
+    Only use with cache stores the process trusts: unpickling runs code.
+    """
+    codec_id = 2
+
+    def __init__(self, protocol: int = pickle.HIGHEST_PROTOCOL):
+        self.protocol = protocol
+
+    def encode(self, value: Any) -> bytes:
+        return pickle.dumps(value, protocol=self.protocol)
+
+    def decode(self, data: bytes) -> Any:
+        return pickle.loads(data)
+
+
+# Codecs decode_envelope accepts when the caller names none. Pickle is left
+# out on purpose: it must be enabled explicitly, for reads as well as writes.
+DEFAULT_CODECS: Dict[int, ICacheCodec] = {
+    JsonCodec.codec_id: JsonCodec(),
+}
+
+
+class Envelope(NamedTuple):
+    value: Any
+    expires: float
+    refresh: float
+
+
+def is_versioned(data: Union[str, bytes]) -> bool:
+    return isinstance(data, (bytes, bytearray, memoryview)) and bytes(data[:2]) == ENVELOPE_MAGIC
+
+
+def encode_envelope(codec: ICacheCodec, value: Any, expires: float, refresh: float = 0,
+                    compress_threshold: Optional[int] = None, compress_level: int = 6) -> bytes:
+    payload = codec.encode(value)
+    flags = 0
+    if compress_threshold is not None and len(payload) >= compress_threshold:
+        payload = zlib.compress(payload, compress_level)
+        flags |= FLAG_ZLIB
+    header = _HEADER.pack(ENVELOPE_MAGIC, ENVELOPE_VERSION, codec.codec_id, flags,
+                          float(expires or 0), float(refresh or 0))
+    return header + payload
+
+
+def decode_envelope(data: Union[str, bytes],
+                    codecs: Optional[Dict[int, ICacheCodec]] = None) -> Envelope:
+    """
+    Decode either a versioned binary envelope or a legacy JSON envelope.
+
+    Versioned envelopes are only decoded with a codec in `codecs` (default
+    DEFAULT_CODECS); any other codec id raises ValueError.
+    """
+    if not is_versioned(data):
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data = bytes(data).decode('utf-8')
+        parsed = json.loads(data)
+        return Envelope(parsed['value'], parsed.get('expires') or 0, parsed.get('refresh') or 0)
+    _, version, codec_id, flags, expires, refresh = _HEADER.unpack_from(data)
+    if version != ENVELOPE_VERSION:
+        raise ValueError(f"Unsupported cache envelope version: {version}")
+    codec = (DEFAULT_CODECS if codecs is None else codecs).get(codec_id)
+    if codec is None:
+        raise ValueError(f"Cache codec id {codec_id} is not enabled for reading")
+    payload = bytes(data[HEADER_SIZE:])
+    if flags & FLAG_ZLIB:
+        payload = zlib.decompress(payload)
+    return Envelope(codec.decode(payload), expires, refresh)
+
+
+def peek_expires(data: Union[str, bytes]) -> float:
+    """Read the expiry of an envelope without decoding its value; 0 means never"""
+    if is_versioned(data):
+        if len(data) < HEADER_SIZE:
+            return 0
+        return _HEADER.unpack_from(data)[4]
+    if not isinstance(data, str) or not data.endswith('}'):
+        return 0
+    idx = data.rfind('"expires": ')
+    if idx < 0:
+        return 0
+    try:
+        return float(data[idx + 11:-1]) or 0
+    except ValueError:
+        return 0
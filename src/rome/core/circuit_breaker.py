@@ -0,0 +1,259 @@
+import asyncio
+from collections import deque
+from enum import Enum
+import time
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+
+class CircuitState(str, Enum):
+    CLOSED = "CLOSED"
+    OPEN = "OPEN"
+    HALF_OPEN = "HALF_OPEN"
+
+
+class CircuitBreakerOpenError(Exception):
+    """Raised when a call is rejected because the circuit is open"""
+
+
+class LoadSheddingError(Exception):
+    """Raised when the concurrency limit is reached and the wait queue is full"""
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD concurrency limit driven by observed latency.
+
+    Each successful call under the latency target raises the limit by about one
+    per limit's worth of calls; a failure or a call slower than the target cuts
+    it by `decrease_factor`, at most once per observed round trip. Without an
+    explicit `latency_target` (ms) the limiter works like Gradient2: a short-term
+    average of latency (about `short_window` calls) is compared against
+    `tolerance` times a long-term average (about `window` calls), so a workload
+    that mixes fast and slow calls is judged by its own typical latency rather
+    than by its fastest calls. Calls beyond the limit wait, and once `max_queue`
+    calls are waiting further calls are shed.
+    """
+
+    def __init__(self, initial_limit: int = 20, min_limit: int = 1, max_limit: int = 200,
+                 latency_target: Optional[float] = None, tolerance: float = 2.0,
+                 decrease_factor: float = 0.9, max_queue: int = 100, window: int = 1000,
+                 short_window: int = 10):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.tolerance = tolerance
+        self.decrease_factor = decrease_factor
+        self.max_queue = max_queue
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._waiting = 0
+        self.window = window
+        self.short_window = short_window
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._samples = 0
+        self._short_rtt = 0.0
+        self._long_rtt = 0.0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+        self.shed = 0
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, int(self._limit))
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    def target(self) -> Optional[float]:
+        if self.latency_target is not None:
+            return self.latency_target
+        if self._samples < 20:
+            return None
+        return self._long_rtt * self.tolerance
+
+    def _observe(self, latency_ms: float) -> None:
+        self._latencies.append(latency_ms)
+        self._samples += 1
+        # Plain running means until each window fills, exponential averages after
+        short = 1.0 / min(self._samples, self.short_window)
+        long = 1.0 / min(self._samples, self.window)
+        self._short_rtt += (latency_ms - self._short_rtt) * short
+        self._long_rtt += (latency_ms - self._long_rtt) * long
+
+    async def acquire(self) -> None:
+        async with self._condition:
+            if self._in_flight >= self.limit:
+                if self._waiting >= self.max_queue:
+                    self.shed += 1
+                    raise LoadSheddingError(
+                        f"Concurrency limit {self.limit} reached with {self._waiting} calls queued"
+                    )
+                self._waiting += 1
+                try:
+                    await self._condition.wait_for(lambda: self._in_flight < self.limit)
+                finally:
+                    self._waiting -= 1
+            self._in_flight += 1
+
+    async def release(self, latency_ms: float, success: bool) -> None:
+        async with self._condition:
+            self._in_flight -= 1
+            self._observe(latency_ms)
+            target = self.target()
+            observed = latency_ms if self.latency_target is not None else self._short_rtt
+            now = time.monotonic()
+            if not success or (target is not None and observed > target):
+                if (now - self._last_decrease) * 1000 >= latency_ms:
+                    self._limit = max(self.min_limit, self._limit * self.decrease_factor)
+                    self._last_decrease = now
+            else:
+                self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+            self._condition.notify_all()
+
+    async def abandon(self) -> None:
+        """Free the slot of a call that was cancelled; it says nothing about latency or health"""
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def percentiles(self) -> Dict[str, float]:
+        if not self._latencies:
+            return {"p50": 0.0, "p90": 0.0, "p99": 0.0}
+        ordered = sorted(self._latencies)
+        last = len(ordered) - 1
+        return {
+            "p50": ordered[int(last * 0.50)],
+            "p90": ordered[int(last * 0.90)],
+            "p99": ordered[int(last * 0.99)],
+        }
+
+
+class CircuitBreaker:
+    """
+    Async circuit breaker with an adaptive concurrency limit.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls
+    fail fast for `reset_timeout` ms. It then half-opens, letting up to
+    `half_open_max_attempts` trial calls through; that many successes close it
+    again and any failure re-opens it. Admitted calls also pass through an
+    AdaptiveConcurrencyLimiter so rising latency sheds load before it turns
+    into failures. `is_failure` decides which exceptions count as failures;
+    others, such as a constraint violation caused by the caller, propagate
+    without tripping the circuit. By default every exception counts.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: int = 60000,
+                 half_open_max_attempts: int = 3,
+                 limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+                 is_failure: Optional[Callable[[Exception], bool]] = None):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_attempts = half_open_max_attempts
+        self.limiter = limiter or AdaptiveConcurrencyLimiter()
+        self.is_failure = is_failure
+        self.state = CircuitState.CLOSED
+        self.failure_count = 0
+        self.last_failure_time: Optional[float] = None
+        self._half_open_successes = 0
+        self._half_open_in_flight = 0
+
+    def _admit(self) -> bool:
+        """Return True if the call is a half-open trial"""
+        if self.state == CircuitState.OPEN:
+            elapsed = (time.monotonic() - (self.last_failure_time or 0)) * 1000
+            if elapsed < self.reset_timeout:
+                raise CircuitBreakerOpenError("Circuit breaker is OPEN")
+            self.state = CircuitState.HALF_OPEN
+            self._half_open_successes = 0
+            self._half_open_in_flight = 0
+        if self.state == CircuitState.HALF_OPEN:
+            if self._half_open_in_flight >= self.half_open_max_attempts:
+                raise CircuitBreakerOpenError("Circuit breaker is HALF_OPEN and at its trial limit")
+            self._half_open_in_flight += 1
+            return True
+        return False
+
+    async def execute(self, operation: Callable[[], Awaitable[Any]],
+                      latency: Optional[Callable[[], Optional[float]]] = None) -> Any:
+        """
+        Run `operation` through the breaker and limiter.
+
+        `latency`, if given, is called afterwards for the milliseconds to report
+        to the limiter in place of the call's wall time, e.g. to leave out time
+        spent waiting for a pooled resource; returning None keeps the wall time.
+        """
+        trial = self._admit()
+        try:
+            await self.limiter.acquire()
+        except BaseException:
+            if trial:
+                self._half_open_in_flight -= 1
+            raise
+        started = time.monotonic()
+        success = False
+        cancelled = False
+        try:
+            result = await operation()
+            success = True
+            self._on_success(trial)
+            return result
+        except Exception as error:
+            if self.is_failure is None or self.is_failure(error):
+                self._on_failure()
+            else:
+                success = True
+                self._on_success(trial)
+            raise
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        finally:
+            if trial and self.state == CircuitState.HALF_OPEN:
+                self._half_open_in_flight -= 1
+            if cancelled:
+                await self.limiter.abandon()
+            else:
+                measured = latency() if latency is not None else None
+                if measured is None:
+                    measured = (time.monotonic() - started) * 1000
+                await self.limiter.release(measured, success)
+
+    def _on_success(self, trial: bool) -> None:
+        if trial and self.state == CircuitState.HALF_OPEN:
+            self._half_open_successes += 1
+            if self._half_open_successes >= self.half_open_max_attempts:
+                self.reset()
+        elif self.state == CircuitState.CLOSED:
+            self.failure_count = 0
+
+    def _on_failure(self) -> None:
+        self.failure_count += 1
+        self.last_failure_time = time.monotonic()
+        if self.state != CircuitState.CLOSED or self.failure_count >= self.failure_threshold:
+            self.state = CircuitState.OPEN
+
+    def reset(self) -> None:
+        self.state = CircuitState.CLOSED
+        self.failure_count = 0
+        self.last_failure_time = None
+        self._half_open_successes = 0
+        self._half_open_in_flight = 0
+
+    def get_state(self) -> str:
+        return self.state.value
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state.value,
+            "failures": self.failure_count,
+            "in_flight": self.limiter.in_flight,
+            "waiting": self.limiter.waiting,
+            "limit": self.limiter.limit,
+            "shed": self.limiter.shed,
+            "latency_ms": self.limiter.percentiles(),
+        }
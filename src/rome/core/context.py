@@ -1,9 +1,64 @@
 # python-sdk/core/context.py
-from typing import Optional, Dict, Any
+from functools import lru_cache
+from typing import Optional, Dict, Any, Callable, FrozenSet, List, Tuple
 from pybars import Compiler
 import re
 from .types import State
 
+# Compiled templates kept per engine; character templates rarely change, so a
+# few hundred covers every template in use
+TEMPLATE_CACHE_SIZE = 256
+
+_PLACEHOLDER = re.compile(r'{{(\w+)}}')
+_compiler = Compiler()
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def _compile_handlebars(template: str) -> Callable[[Any], str]:
+    return _compiler.compile(template)
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def _compile_segments(template: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """Split a template into literal chunks and the slot names between them"""
+    parts = _PLACEHOLDER.split(template)
+    return tuple(parts[0::2]), tuple(parts[1::2])
+
+
+_MUSTACHE = re.compile(r'{{{?(.*?)}?}}', re.DOTALL)
+_IDENTIFIER = re.compile(r'(?<![\w.@])[A-Za-z_]\w*')
+# Path prefixes that still resolve against the top-level state: {{@root.bio}}, {{this.bio}}
+_SCOPE = re.compile(r'@root\.|\bthis\.')
+_STRING = re.compile(r'"[^"]*"|\'[^\']*\'')
+_HELPERS = frozenset({"if", "unless", "each", "with", "else", "this", "lookup", "log", "as"})
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def template_keys(template: str, templating_engine: Optional[str] = None) -> FrozenSet[str]:
+    """
+    State keys a template references.
+
+    For handlebars this is every top-level identifier inside a mustache, minus
+    built-in helpers, so it may include a few extra names but never misses one
+    the template reads.
+    """
+    if templating_engine != "handlebars":
+        return frozenset(_compile_segments(template)[1])
+    keys = set()
+    for expression in _MUSTACHE.findall(template):
+        expression = expression.strip()
+        if expression.startswith("!"):
+            continue
+        expression = _SCOPE.sub("", _STRING.sub("", expression.lstrip("#^/>&")))
+        keys.update(_IDENTIFIER.findall(expression))
+    return frozenset(keys - _HELPERS)
+
+
+def clear_template_cache() -> None:
+    _compile_handlebars.cache_clear()
+    _compile_segments.cache_clear()
+    template_keys.cache_clear()
+
 def compose_context(
     state: State,
     template: str,
@@ -28,16 +83,15 @@ def compose_context(
     """
     # Use handlebars engine if specified
     if templating_engine == "handlebars":
-        compiler = Compiler()
-        template_fn = compiler.compile(template)
-        return template_fn(state)
-    
-    # Simple replacement using regex
-    def replace_match(match):
-        key = match.group(0)[2:-2]  # Strip {{ and }}
-        return str(state.get(key, ""))
-        
-    return re.sub(r'{{(\w+)}}', replace_match, template)
+        return _compile_handlebars(template)(state)
+
+    # Simple replacement from the precompiled literal / slot segments
+    literals, slots = _compile_segments(template)
+    parts: List[str] = [literals[0]]
+    for slot, literal in zip(slots, literals[1:]):
+        parts.append(str(state.get(slot, "")))
+        parts.append(literal)
+    return "".join(parts)
 
 def add_header(header: str, body: str) -> str:
     """
@@ -1,29 +1,55 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional, Dict, Any
+import asyncio
+from typing import AsyncIterator, Callable, List, Optional, Dict, Any
 from uuid import UUID
 
 from .types import (
     Account, Actor, Goal, Memory, Relationship, 
     GoalStatus, Participant, IDatabaseAdapter
 )
-from .database.circuit_breaker import CircuitBreaker
+from .circuit_breaker import AdaptiveConcurrencyLimiter, CircuitBreaker
 from .logger import rome_logger
 
 class DatabaseAdapter(IDatabaseAdapter, ABC):
     """Abstract database adapter with circuit breaker pattern"""
     
     def __init__(self, circuit_breaker_config: Optional[Dict] = None):
+        config = circuit_breaker_config or {}
         self.circuit_breaker = CircuitBreaker(
-            failure_threshold=circuit_breaker_config.get('failure_threshold', 5),
-            reset_timeout=circuit_breaker_config.get('reset_timeout', 60000),
-            half_open_max_attempts=circuit_breaker_config.get('half_open_max_attempts', 3)
+            failure_threshold=config.get('failure_threshold', 5),
+            reset_timeout=config.get('reset_timeout', 60000),
+            half_open_max_attempts=config.get('half_open_max_attempts', 3),
+            limiter=AdaptiveConcurrencyLimiter(
+                initial_limit=config.get('initial_concurrency', 20),
+                min_limit=config.get('min_concurrency', 1),
+                max_limit=config.get('max_concurrency', 200),
+                latency_target=config.get('latency_target'),
+                max_queue=config.get('max_queue', 100)
+            ),
+            is_failure=config.get('is_failure')
         )
         self.db = None
-
-    async def with_circuit_breaker(self, operation, context: str):
+        self._invalidation_hooks: List[Callable[[str, UUID], None]] = []
+
+    def add_invalidation_hook(self, hook: Callable[[str, UUID], None]) -> None:
+        """
+        Register `hook(kind, id)`, called after a write changes an account
+        (kind 'account', the account id) or a room's participants (kind 'room',
+        the room id), so caches such as ActorCache can drop stale entries.
+        """
+        self._invalidation_hooks.append(hook)
+
+    def _invalidate(self, kind: str, id_: UUID) -> None:
+        for hook in self._invalidation_hooks:
+            try:
+                hook(kind, id_)
+            except Exception as error:
+                rome_logger.error(f"Invalidation hook failed for {kind} {id_}: {error}")
+
+    async def with_circuit_breaker(self, operation, context: str, latency=None):
         """Execute operation with circuit breaker protection"""
         try:
-            return await self.circuit_breaker.execute(operation)
+            return await self.circuit_breaker.execute(operation, latency)
         except Exception as error:
             rome_logger.error(f"Circuit breaker error in {context}:", {
                 "error": str(error),
@@ -31,6 +57,10 @@ class DatabaseAdapter(IDatabaseAdapter, ABC):
             })
             raise
 
+    def get_circuit_breaker_stats(self) -> Dict[str, Any]:
+        """State, in-flight count, concurrency limit and latency percentiles"""
+        return self.circuit_breaker.get_stats()
+
     @abstractmethod
     async def init(self) -> None:
         """Initialize database connection"""
@@ -46,16 +76,60 @@ class DatabaseAdapter(IDatabaseAdapter, ABC):
         """Get account by ID"""
         raise NotImplementedError
 
+    async def get_accounts_by_ids(self, user_ids: List[UUID]) -> List[Account]:
+        """Get several accounts; backends should override with a single query"""
+        accounts = await asyncio.gather(*[self.get_account_by_id(user_id) for user_id in user_ids])
+        return [account for account in accounts if account is not None]
+
     @abstractmethod
     async def create_account(self, account: Account) -> bool:
         """Create new account"""
         raise NotImplementedError
 
+    # camelCase entry points used through IDatabaseAdapter
+
+    async def getAccountById(self, userId: UUID) -> Optional[Account]:
+        return await self.get_account_by_id(userId)
+
+    async def getAccountsByIds(self, userIds: List[UUID]) -> List[Account]:
+        return await self.get_accounts_by_ids(userIds)
+
+    async def getParticipantsForRoom(self, roomId: UUID) -> List[UUID]:
+        return await self.get_participants_for_room(roomId)
+
     @abstractmethod
     async def get_memories(self, params: Dict) -> List[Memory]:
         """Get memories with parameters"""
         raise NotImplementedError
 
+    async def iter_memories(self, params: Dict, page_size: int = 100,
+                            include_embeddings: bool = True) -> AsyncIterator[Memory]:
+        """
+        Stream the memories `get_memories` would return, newest first, keyset
+        paginated by (createdAt, id) so only one page is held at a time.
+
+        This default pages through `get_memories` with a moving `end` bound;
+        backends should override it with a native keyset query.
+        """
+        params = {**params}
+        params.pop('count', None)
+        # Ids already yielded at the boundary timestamp, since `end` is inclusive
+        boundary: set = set()
+        while True:
+            page = await self.get_memories({**params, 'count': page_size + len(boundary)})
+            fresh = [memory for memory in page if memory.id not in boundary]
+            for memory in fresh:
+                if not include_embeddings:
+                    memory.embedding = None
+                yield memory
+            if len(page) < page_size + len(boundary) or not fresh:
+                return
+            last = fresh[-1].createdAt
+            if last != params.get('end'):
+                boundary = set()
+            boundary.update(memory.id for memory in fresh if memory.createdAt == last)
+            params['end'] = last
+
     @abstractmethod
     async def get_memories_by_room_ids(self, params: Dict) -> List[Memory]:
         """Get memories for multiple rooms"""
@@ -71,6 +145,11 @@ class DatabaseAdapter(IDatabaseAdapter, ABC):
         """Create new memory"""
         raise NotImplementedError
 
+    async def create_memories(self, memories: List[Memory], table_name: str, unique: bool = False) -> None:
+        """Create several memories; backends should override with a single transaction"""
+        for memory in memories:
+            await self.create_memory(memory, table_name, unique)
+
     @abstractmethod
     async def get_goals(self, params: Dict) -> List[Goal]:
         """Get goals with parameters"""
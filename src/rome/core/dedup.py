@@ -0,0 +1,179 @@
+import hashlib
+import re
+from typing import Dict, Hashable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .vector_index import normalize
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def _hash64(data: str) -> int:
+    return int.from_bytes(hashlib.blake2b(data.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def content_hash(text: str) -> int:
+    """64-bit hash of the text with case and whitespace normalised"""
+    return _hash64(" ".join(text.casefold().split()))
+
+
+def simhash(tokens: Sequence[str]) -> int:
+    """64-bit SimHash over word unigrams and bigrams"""
+    features = list(tokens) + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    hashes = np.array([_hash64(feature) for feature in features], dtype='>u8')
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1)
+    votes = bits.sum(axis=0) * 2 > len(features)
+    return int.from_bytes(np.packbits(votes).tobytes(), 'big')
+
+
+class DedupMatch(NamedTuple):
+    id: Hashable
+    # 'exact', 'simhash' or 'embedding'
+    kind: str
+
+
+class DedupIndex:
+    """
+    Near-duplicate detector for memory inserts.
+
+    Three checks run in order, each in roughly constant time per insert:
+    an exact hash of the normalised text; SimHash on the text, where the 64
+    bits are split into `simhash_distance + 1` bands so any fingerprint within
+    that Hamming distance shares at least one band bucket; and random-hyperplane
+    LSH on the embedding, where bucket candidates are confirmed with an exact
+    cosine against `embedding_threshold`. The embedding check is approximate:
+    a pair just above the threshold can land in different buckets in every
+    table. Entries are scoped (e.g. by room and agent), so only memories in
+    the same scope are compared.
+    """
+
+    def __init__(self, embedding_threshold: float = 0.95, simhash_distance: int = 3,
+                 min_simhash_tokens: int = 4, n_tables: int = 12, n_planes: int = 12,
+                 max_candidates: int = 64, seed: int = 0):
+        self.embedding_threshold = embedding_threshold
+        self.simhash_distance = simhash_distance
+        self.min_simhash_tokens = min_simhash_tokens
+        self.n_tables = n_tables
+        self.n_planes = n_planes
+        self.max_candidates = max_candidates
+        self.seed = seed
+        self._band_bits = 64 // (simhash_distance + 1)
+        self._planes: Optional[np.ndarray] = None
+        self._exact: Dict[Tuple[Hashable, int], Hashable] = {}
+        self._simhash_buckets: Dict[Tuple[Hashable, int, int], List[Tuple[Hashable, int]]] = {}
+        self._lsh_buckets: Dict[Tuple[Hashable, int, int], List[Hashable]] = {}
+        self._vectors: Dict[Hashable, np.ndarray] = {}
+        # id -> (exact key, simhash bucket keys, LSH bucket keys), so entries can be removed
+        self._entries: Dict[Hashable, Tuple[Optional[tuple], List[tuple], List[tuple]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, id_: Hashable) -> bool:
+        return id_ in self._entries
+
+    def _bands(self, fingerprint: int) -> List[int]:
+        mask = (1 << self._band_bits) - 1
+        return [(fingerprint >> (i * self._band_bits)) & mask for i in range(self.simhash_distance + 1)]
+
+    def _fingerprint(self, text: Optional[str]) -> Optional[int]:
+        if not text:
+            return None
+        tokens = _TOKEN.findall(text.casefold())
+        if len(tokens) < self.min_simhash_tokens:
+            return None
+        return simhash(tokens)
+
+    def _signatures(self, vector: np.ndarray) -> List[int]:
+        if self._planes is None:
+            rng = np.random.default_rng(self.seed)
+            self._planes = rng.standard_normal((self.n_tables * self.n_planes, vector.shape[0])).astype(np.float32)
+        if self._planes.shape[1] != vector.shape[0]:
+            raise ValueError(f"Embedding dimension {vector.shape[0]} does not match index dimension {self._planes.shape[1]}")
+        bits = (self._planes @ vector > 0).reshape(self.n_tables, self.n_planes)
+        weights = 1 << np.arange(self.n_planes)
+        return (bits @ weights).tolist()
+
+    @staticmethod
+    def _unit(embedding: Sequence[float]) -> np.ndarray:
+        return normalize(np.asarray(embedding, dtype=np.float32))
+
+    def check(self, scope: Hashable, text: Optional[str] = None,
+              embedding: Optional[Sequence[float]] = None) -> Optional[DedupMatch]:
+        """Return the first stored entry that `text` / `embedding` duplicates, if any"""
+        if text:
+            match = self._exact.get((scope, content_hash(text)))
+            if match is not None:
+                return DedupMatch(match, 'exact')
+            fingerprint = self._fingerprint(text)
+            if fingerprint is not None:
+                for band, value in enumerate(self._bands(fingerprint)):
+                    for id_, other in self._simhash_buckets.get((scope, band, value), ())[:self.max_candidates]:
+                        if bin(fingerprint ^ other).count('1') <= self.simhash_distance:
+                            return DedupMatch(id_, 'simhash')
+        if embedding is not None and len(embedding):
+            vector = self._unit(embedding)
+            seen = set()
+            for table, signature in enumerate(self._signatures(vector)):
+                for id_ in self._lsh_buckets.get((scope, table, signature), ())[:self.max_candidates]:
+                    if id_ in seen:
+                        continue
+                    seen.add(id_)
+                    if float(self._vectors[id_].astype(np.float32) @ vector) >= self.embedding_threshold:
+                        return DedupMatch(id_, 'embedding')
+        return None
+
+    def add(self, id_: Hashable, scope: Hashable, text: Optional[str] = None,
+            embedding: Optional[Sequence[float]] = None) -> None:
+        """Index an entry; only entries judged unique need to be added, and re-adding an id is a no-op"""
+        if id_ in self._entries:
+            return
+        exact, simhash_keys, lsh_keys = None, [], []
+        if text:
+            exact = (scope, content_hash(text))
+            self._exact.setdefault(exact, id_)
+            fingerprint = self._fingerprint(text)
+            if fingerprint is not None:
+                for band, value in enumerate(self._bands(fingerprint)):
+                    simhash_keys.append((scope, band, value))
+                    self._simhash_buckets.setdefault(simhash_keys[-1], []).append((id_, fingerprint))
+        if embedding is not None and len(embedding):
+            vector = self._unit(embedding)
+            # float16 halves the footprint and is ample precision for the final cosine check
+            self._vectors[id_] = vector.astype(np.float16)
+            for table, signature in enumerate(self._signatures(vector)):
+                lsh_keys.append((scope, table, signature))
+                self._lsh_buckets.setdefault(lsh_keys[-1], []).append(id_)
+        self._entries[id_] = (exact, simhash_keys, lsh_keys)
+
+    def remove(self, id_: Hashable) -> bool:
+        """Forget an entry, e.g. one reserved by check_and_add whose insert then failed"""
+        entry = self._entries.pop(id_, None)
+        if entry is None:
+            return False
+        exact, simhash_keys, lsh_keys = entry
+        if exact is not None and self._exact.get(exact) == id_:
+            del self._exact[exact]
+        for key in simhash_keys:
+            bucket = [item for item in self._simhash_buckets.get(key, ()) if item[0] != id_]
+            if bucket:
+                self._simhash_buckets[key] = bucket
+            else:
+                self._simhash_buckets.pop(key, None)
+        for key in lsh_keys:
+            bucket = [other for other in self._lsh_buckets.get(key, ()) if other != id_]
+            if bucket:
+                self._lsh_buckets[key] = bucket
+            else:
+                self._lsh_buckets.pop(key, None)
+        self._vectors.pop(id_, None)
+        return True
+
+    def check_and_add(self, id_: Hashable, scope: Hashable, text: Optional[str] = None,
+                      embedding: Optional[Sequence[float]] = None) -> Optional[DedupMatch]:
+        """Check an entry and index it if it is not a duplicate"""
+        match = self.check(scope, text, embedding)
+        if match is None:
+            self.add(id_, scope, text, embedding)
+        return match
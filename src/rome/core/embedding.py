@@ -0,0 +1,135 @@
+import struct
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# Serialized form: magic (2s) | dtype code (B) | reserved (B) | scale (f) | raw values
+_MAGIC = b'RE'
+_HEADER = struct.Struct('<2sBxf')
+
+DTYPES = {
+    'float32': (0, np.float32),
+    'float16': (1, np.float16),
+    'int8': (2, np.int8),
+}
+_BY_CODE = {code: (name, dtype) for name, (code, dtype) in DTYPES.items()}
+_CODE_BY_NUMPY = {np.dtype(dtype): code for code, dtype in DTYPES.values()}
+
+
+def quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convert float32 rows to `dtype`, returning (values, per-row scale).
+
+    int8 uses symmetric scalar quantization (value * scale ~= original); the
+    float formats keep a scale of 1.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == 'int8':
+        peak = np.abs(vectors).max(axis=-1)
+        scale = np.where(peak > 0, peak / 127.0, 1.0).astype(np.float32)
+        values = np.rint(vectors / scale[..., None]).astype(np.int8)
+        return values, scale
+    if dtype not in DTYPES:
+        raise ValueError(f"Unsupported embedding dtype: {dtype}")
+    return vectors.astype(DTYPES[dtype][1]), np.ones(vectors.shape[:-1], dtype=np.float32)
+
+
+class CompactEmbedding:
+    """
+    Embedding held as a packed float32, float16 or int8 buffer.
+
+    A 1536-dim embedding is ~6 KB as float32 and ~1.5 KB as int8, against
+    ~50 KB as a list of Python floats. It behaves as a read-only sequence of
+    floats, so code written for `List[float]` embeddings keeps working.
+    """
+
+    __slots__ = ('values', 'scale')
+
+    def __init__(self, values: np.ndarray, scale: float = 1.0):
+        self.values = values
+        self.scale = float(scale)
+
+    @classmethod
+    def from_floats(cls, values: Union[Sequence[float], np.ndarray],
+                    dtype: str = 'float32') -> "CompactEmbedding":
+        if isinstance(values, CompactEmbedding):
+            if values.dtype == dtype:
+                return values
+            values = values.to_numpy()
+        quantized, scale = quantize(np.asarray(values, dtype=np.float32), dtype)
+        return cls(quantized, float(scale))
+
+    @property
+    def dtype(self) -> str:
+        return _BY_CODE[self._code][0]
+
+    @property
+    def _code(self) -> int:
+        return _CODE_BY_NUMPY[self.values.dtype]
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes
+
+    def to_numpy(self) -> np.ndarray:
+        """Dequantized float32 copy"""
+        values = self.values.astype(np.float32)
+        if self.scale != 1.0:
+            values *= self.scale
+        return values
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        values = self.to_numpy()
+        return values if dtype is None else values.astype(dtype)
+
+    def tolist(self) -> List[float]:
+        return self.to_numpy().tolist()
+
+    def to_bytes(self) -> bytes:
+        return _HEADER.pack(_MAGIC, self._code, self.scale) + self.values.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CompactEmbedding":
+        magic, code, scale = _HEADER.unpack_from(data)
+        if magic != _MAGIC or code not in _BY_CODE:
+            raise ValueError("Not a serialized CompactEmbedding")
+        values = np.frombuffer(data, dtype=_BY_CODE[code][1], offset=_HEADER.size)
+        return cls(values, scale)
+
+    @staticmethod
+    def is_serialized(data: bytes) -> bool:
+        """True if `data` looks like to_bytes() output rather than a raw float32 blob"""
+        if len(data) < _HEADER.size or data[:2] != _MAGIC or data[2] not in _BY_CODE:
+            return False
+        itemsize = np.dtype(_BY_CODE[data[2]][1]).itemsize
+        return (len(data) - _HEADER.size) % itemsize == 0
+
+    def __reduce__(self):
+        return (CompactEmbedding.from_bytes, (self.to_bytes(),))
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __iter__(self) -> Iterator[float]:
+        return iter(self.tolist())
+
+    def __getitem__(self, index):
+        values = self.values[index]
+        if np.ndim(values):
+            return (values.astype(np.float32) * self.scale).tolist()
+        return float(values) * self.scale
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, CompactEmbedding):
+            return self.scale == other.scale and np.array_equal(self.values, other.values)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"CompactEmbedding(dim={len(self)}, dtype={self.dtype})"
+
+
+def to_compact(embedding: Optional[Union[Sequence[float], CompactEmbedding]],
+               dtype: str = 'float32') -> Optional[CompactEmbedding]:
+    if embedding is None:
+        return None
+    return CompactEmbedding.from_floats(embedding, dtype)
@@ -0,0 +1,146 @@
+from array import array
+import math
+import re
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .vector_index import _Codes, top_k
+
+# Keeps tickers ($BTC), handles (@user), tags (#x) and dotted/dashed codes
+# (ERR-42, v1.2.3, api.example.com) as single tokens
+_TOKEN = re.compile(r"[$@#]?\w+(?:[.\-]\w+)*", re.UNICODE)
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN.findall(text.casefold()) if text else []
+
+
+class LexicalIndex:
+    """
+    Incremental inverted index with BM25 scoring.
+
+    Each term's postings are two packed arrays (document, term frequency), so a
+    query scores only the documents containing its terms, accumulated into a
+    dense score vector with NumPy. Documents carry room, agent and uniqueness
+    labels for filtering. Re-adding an id tombstones its earlier version.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, capacity: int = 1024):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._ids: List[Hashable] = []
+        self._docs: Dict[Hashable, int] = {}
+        self._lengths = np.zeros(capacity, dtype=np.float32)
+        self._rooms = np.full(capacity, -1, dtype=np.int32)
+        self._agents = np.full(capacity, -1, dtype=np.int32)
+        self._unique = np.ones(capacity, dtype=bool)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._room_codes = _Codes()
+        self._agent_codes = _Codes()
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __contains__(self, id_: Hashable) -> bool:
+        return id_ in self._docs
+
+    def _grow(self) -> None:
+        capacity = len(self._lengths) * 2
+        self._lengths = np.resize(self._lengths, capacity)
+        self._rooms = np.resize(self._rooms, capacity)
+        self._agents = np.resize(self._agents, capacity)
+        self._unique = np.resize(self._unique, capacity)
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(self._ids)] = self._alive[:len(self._ids)]
+        self._alive = alive
+
+    def add(self, id_: Hashable, text: Optional[str], room_id: Optional[Hashable] = None,
+            agent_id: Optional[Hashable] = None, unique: bool = True) -> None:
+        self.remove(id_)
+        tokens = tokenize(text)
+        doc = len(self._ids)
+        if doc == len(self._lengths):
+            self._grow()
+        self._ids.append(id_)
+        self._docs[id_] = doc
+        self._lengths[doc] = len(tokens)
+        self._rooms[doc] = self._room_codes.encode(room_id)
+        self._agents[doc] = self._agent_codes.encode(agent_id)
+        self._unique[doc] = unique
+        self._alive[doc] = True
+        self._total_length += len(tokens)
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for term, count in counts.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array('i'), array('i'))
+            postings[0].append(doc)
+            postings[1].append(count)
+
+    def remove(self, id_: Hashable) -> bool:
+        """Tombstone a document; its postings stay until the index is rebuilt"""
+        doc = self._docs.pop(id_, None)
+        if doc is None:
+            return False
+        self._alive[doc] = False
+        self._total_length -= int(self._lengths[doc])
+        return True
+
+    def _filter(self, room_id: Optional[Hashable], agent_id: Optional[Hashable],
+                unique: bool) -> Optional[np.ndarray]:
+        size = len(self._ids)
+        mask = self._alive[:size].copy()
+        for label, codes, column in ((room_id, self._room_codes, self._rooms),
+                                     (agent_id, self._agent_codes, self._agents)):
+            if label is None:
+                continue
+            code = codes.lookup(label)
+            if code is None:
+                return None
+            mask &= column[:size] == code
+        if unique:
+            mask &= self._unique[:size]
+        return mask
+
+    def search(self, query: str, k: int = 10, room_id: Optional[Hashable] = None,
+               agent_id: Optional[Hashable] = None, unique: bool = False) -> List[Tuple[Hashable, float]]:
+        """Return up to k (id, BM25 score) pairs, best first"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        live = len(self._docs)
+        if not terms or live == 0:
+            return []
+        mask = self._filter(room_id, agent_id, unique)
+        if mask is None:
+            return []
+        size = len(self._ids)
+        average = max(self._total_length / live, 1e-9)
+        norms = self.k1 * (1 - self.b + self.b * self._lengths[:size] / average)
+        scores = np.zeros(size, dtype=np.float32)
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            docs = np.frombuffer(postings[0], dtype=np.int32)
+            tfs = np.frombuffer(postings[1], dtype=np.int32).astype(np.float32)
+            # Document frequency counts tombstoned postings too; close enough between rebuilds
+            frequency = len(docs)
+            idf = math.log(1 + (live - frequency + 0.5) / (frequency + 0.5))
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norms[docs])
+        scores[~mask] = 0
+        matched = np.flatnonzero(scores > 0)
+        best = top_k(scores[matched], k)
+        return [(self._ids[matched[b]], float(scores[matched[b]])) for b in best]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Hashable]], k: int = 60) -> List[Tuple[Hashable, float]]:
+    """Fuse ranked id lists by summing 1 / (k + rank), best first"""
+    fused: Dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, id_ in enumerate(ranking, start=1):
+            fused[id_] = fused.get(id_, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
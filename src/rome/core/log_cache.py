@@ -0,0 +1,332 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import mmap
+import os
+import struct
+import uuid
+import zlib
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .cache import CacheValue, ICacheAdapter
+from .logger import rome_logger
+
+# Segment file: header, then append-only records
+#   header: magic (4s) | segment id (16s)
+#   record: crc32 (I) | flags (B) | key length (I) | value length (I) | key | value
+_SEGMENT_MAGIC = b'RLS1'
+_SEGMENT_HEADER = struct.Struct('>4s16s')
+_RECORD_HEADER = struct.Struct('>IBII')
+
+# Hint file: snapshot of the index for fast restarts
+#   header: magic (4s) | segment id (16s) | covered segment size (Q) | entry count (I)
+#   entry:  value offset (Q) | value length (I) | flags (B) | key length (H) | key
+_HINT_MAGIC = b'RLH1'
+_HINT_HEADER = struct.Struct('>4s16sQI')
+_HINT_ENTRY = struct.Struct('>QIBH')
+
+FLAG_TOMBSTONE = 0x01
+FLAG_BYTES = 0x02
+
+
+class _Location(NamedTuple):
+    offset: int
+    length: int
+    flags: int
+
+
+def _record_crc(flags: int, key: bytes, value: bytes) -> int:
+    crc = zlib.crc32(struct.pack('>BII', flags, len(key), len(value)))
+    crc = zlib.crc32(key, crc)
+    return zlib.crc32(value, crc)
+
+
+def _pack_record(key: bytes, value: bytes, flags: int) -> bytes:
+    header = _RECORD_HEADER.pack(_record_crc(flags, key, value), flags, len(key), len(value))
+    return header + key + value
+
+
+class LogCacheAdapter(ICacheAdapter):
+    """
+    Persistent cache backed by a single append-only segment file.
+
+    An in-memory index maps each key to its value's offset in the segment and
+    reads are served from an mmap of the file. Deletes and overwrites append
+    records; a background compaction rewrites the live set once
+    `compact_ratio` of the segment is dead. The index is persisted to a hint
+    file on close and after compaction, so restarts only scan records appended
+    after the last hint.
+    """
+
+    def __init__(self, data_dir: str, name: str = 'cache',
+                 compact_ratio: float = 0.5, compact_min_bytes: int = 4 * 1024 * 1024,
+                 fsync: bool = False):
+        self.data_dir = Path(data_dir)
+        self.segment_path = self.data_dir / f"{name}.seg"
+        self.hint_path = self.data_dir / f"{name}.hint"
+        self.compact_ratio = compact_ratio
+        self.compact_min_bytes = compact_min_bytes
+        self.fsync = fsync
+        self.index: Dict[bytes, _Location] = {}
+        self.dead_bytes = 0
+        self.compactions = 0
+        self._segment_id = b''
+        self._size = 0
+        self._fd: Optional[int] = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._write_lock = asyncio.Lock()
+        self._compaction: Optional[asyncio.Task] = None
+        # One writer thread keeps appends ordered and off the event loop
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rome-log-cache")
+        self._open()
+
+    #
+    # Startup
+    #
+
+    def _open(self) -> None:
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        if not self.segment_path.exists() or self.segment_path.stat().st_size < _SEGMENT_HEADER.size:
+            self._create_segment(self.segment_path)
+        self._fd = os.open(self.segment_path, os.O_RDWR | os.O_APPEND)
+        header = os.pread(self._fd, _SEGMENT_HEADER.size, 0)
+        magic, self._segment_id = _SEGMENT_HEADER.unpack(header)
+        if magic != _SEGMENT_MAGIC:
+            raise ValueError(f"Not a cache segment file: {self.segment_path}")
+        self._size = os.fstat(self._fd).st_size
+        start = self._load_hint()
+        if start is None:
+            self.index.clear()
+            self.dead_bytes = 0
+            start = _SEGMENT_HEADER.size
+        self._remap()
+        good = self._scan(start)
+        if good < self._size:
+            rome_logger.warning(f"Truncating torn cache segment tail at {good} bytes")
+            os.ftruncate(self._fd, good)
+            self._size = good
+            self._remap()
+
+    @staticmethod
+    def _create_segment(path: Path) -> None:
+        tmp = path.with_suffix(path.suffix + '.tmp')
+        with open(tmp, 'wb') as f:
+            f.write(_SEGMENT_HEADER.pack(_SEGMENT_MAGIC, uuid.uuid4().bytes))
+        os.replace(tmp, path)
+
+    def _load_hint(self) -> Optional[int]:
+        """Load the hint file, returning the segment offset it covers, or None if unusable"""
+        try:
+            data = self.hint_path.read_bytes()
+            magic, segment_id, covered, count = _HINT_HEADER.unpack_from(data)
+        except (OSError, struct.error):
+            return None
+        if magic != _HINT_MAGIC or segment_id != self._segment_id or covered > self._size:
+            return None
+        pos = _HINT_HEADER.size
+        live = 0
+        try:
+            for _ in range(count):
+                offset, length, flags, key_len = _HINT_ENTRY.unpack_from(data, pos)
+                pos += _HINT_ENTRY.size
+                key = data[pos:pos + key_len]
+                pos += key_len
+                self.index[key] = _Location(offset, length, flags)
+                live += _RECORD_HEADER.size + key_len + length
+        except struct.error:
+            self.index.clear()
+            return None
+        self.dead_bytes = max(0, covered - _SEGMENT_HEADER.size - live)
+        return covered
+
+    def _scan(self, start: int) -> int:
+        """Replay records from `start`, returning the end of the last intact record"""
+        pos = start
+        buf = self._mmap
+        while pos + _RECORD_HEADER.size <= self._size:
+            crc, flags, key_len, value_len = _RECORD_HEADER.unpack_from(buf, pos)
+            key_start = pos + _RECORD_HEADER.size
+            value_start = key_start + key_len
+            end = value_start + value_len
+            if end > self._size:
+                break
+            key = bytes(buf[key_start:value_start])
+            if _record_crc(flags, key, buf[value_start:end]) != crc:
+                break
+            previous = self.index.pop(key, None)
+            if previous is not None:
+                self.dead_bytes += _RECORD_HEADER.size + len(key) + previous.length
+            if flags & FLAG_TOMBSTONE:
+                self.dead_bytes += end - pos
+            else:
+                self.index[key] = _Location(value_start, value_len, flags)
+            pos = end
+        return pos
+
+    def _remap(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+        self._mmap = mmap.mmap(self._fd, self._size, access=mmap.ACCESS_READ)
+
+    #
+    # Reads
+    #
+
+    def _read(self, key: bytes) -> Optional[CacheValue]:
+        location = self.index.get(key)
+        if location is None:
+            return None
+        end = location.offset + location.length
+        if end > len(self._mmap):
+            self._remap()
+        value = self._mmap[location.offset:end]
+        if location.flags & FLAG_BYTES:
+            return value
+        return value.decode('utf-8')
+
+    async def get(self, key: str) -> Optional[CacheValue]:
+        return self._read(key.encode('utf-8'))
+
+    async def get_many(self, keys: List[str]) -> Dict[str, CacheValue]:
+        result = {}
+        for key in keys:
+            value = self._read(key.encode('utf-8'))
+            if value is not None:
+                result[key] = value
+        return result
+
+    #
+    # Writes
+    #
+
+    def _append(self, blob: bytes) -> None:
+        os.write(self._fd, blob)
+        if self.fsync:
+            os.fsync(self._fd)
+
+    async def _write(self, entries: List[Tuple[bytes, Optional[CacheValue]]]) -> None:
+        async with self._write_lock:
+            chunks = []
+            updates = []
+            pos = self._size
+            for key, value in entries:
+                if value is None:
+                    if key not in self.index:
+                        continue
+                    record = _pack_record(key, b'', FLAG_TOMBSTONE)
+                    updates.append((key, None))
+                else:
+                    flags = FLAG_BYTES if isinstance(value, bytes) else 0
+                    raw = value if flags else value.encode('utf-8')
+                    record = _pack_record(key, raw, flags)
+                    value_start = pos + _RECORD_HEADER.size + len(key)
+                    updates.append((key, _Location(value_start, len(raw), flags)))
+                chunks.append(record)
+                pos += len(record)
+            if not chunks:
+                return
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._executor, self._append, b''.join(chunks))
+            self._size = pos
+            for key, location in updates:
+                previous = self.index.pop(key, None)
+                if previous is not None:
+                    self.dead_bytes += _RECORD_HEADER.size + len(key) + previous.length
+                if location is None:
+                    self.dead_bytes += _RECORD_HEADER.size + len(key)
+                else:
+                    self.index[key] = location
+        self._maybe_compact()
+
+    async def set(self, key: str, value: CacheValue) -> None:
+        await self._write([(key.encode('utf-8'), value)])
+
+    async def delete(self, key: str) -> None:
+        await self._write([(key.encode('utf-8'), None)])
+
+    async def set_many(self, entries: Dict[str, CacheValue]) -> None:
+        await self._write([(key.encode('utf-8'), value) for key, value in entries.items()])
+
+    async def delete_many(self, keys: List[str]) -> None:
+        await self._write([(key.encode('utf-8'), None) for key in keys])
+
+    #
+    # Compaction and hints
+    #
+
+    def _maybe_compact(self) -> None:
+        if self._compaction is not None and not self._compaction.done():
+            return
+        if self._size < self.compact_min_bytes or self.dead_bytes < self._size * self.compact_ratio:
+            return
+        self._compaction = asyncio.create_task(self.compact())
+
+    def _rewrite(self, index: Dict[bytes, _Location], source: mmap.mmap,
+                 segment_id: bytes) -> Tuple[Dict[bytes, _Location], int]:
+        tmp_path = self.segment_path.with_suffix('.seg.compact')
+        new_index = {}
+        with open(tmp_path, 'wb') as f:
+            f.write(_SEGMENT_HEADER.pack(_SEGMENT_MAGIC, segment_id))
+            pos = _SEGMENT_HEADER.size
+            for key, location in index.items():
+                value = source[location.offset:location.offset + location.length]
+                record = _pack_record(key, value, location.flags)
+                f.write(record)
+                new_index[key] = _Location(pos + _RECORD_HEADER.size + len(key),
+                                           location.length, location.flags)
+                pos += len(record)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.segment_path)
+        return new_index, pos
+
+    def _write_hint(self, index: Dict[bytes, _Location], segment_id: bytes, covered: int) -> None:
+        parts = [_HINT_HEADER.pack(_HINT_MAGIC, segment_id, covered, len(index))]
+        for key, location in index.items():
+            parts.append(_HINT_ENTRY.pack(location.offset, location.length, location.flags, len(key)))
+            parts.append(key)
+        tmp = self.hint_path.with_suffix('.hint.tmp')
+        tmp.write_bytes(b''.join(parts))
+        os.replace(tmp, self.hint_path)
+
+    async def compact(self) -> int:
+        """Rewrite the segment with only live records, returning the bytes reclaimed"""
+        loop = asyncio.get_running_loop()
+        async with self._write_lock:
+            before = self._size
+            if self._size > len(self._mmap):
+                self._remap()
+            segment_id = uuid.uuid4().bytes
+            new_index, new_size = await loop.run_in_executor(
+                self._executor, self._rewrite, dict(self.index), self._mmap, segment_id
+            )
+            os.close(self._fd)
+            self._fd = os.open(self.segment_path, os.O_RDWR | os.O_APPEND)
+            self._segment_id = segment_id
+            self._size = new_size
+            self.index = new_index
+            self.dead_bytes = 0
+            self._remap()
+            await loop.run_in_executor(
+                self._executor, self._write_hint, dict(self.index), segment_id, new_size
+            )
+            self.compactions += 1
+        rome_logger.debug(f"Compacted cache segment from {before} to {new_size} bytes")
+        return before - new_size
+
+    async def close(self) -> None:
+        """Finish compaction, persist the hint file and release the segment"""
+        if self._compaction is not None and not self._compaction.done():
+            await self._compaction
+        async with self._write_lock:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                self._executor, self._write_hint, dict(self.index), self._segment_id, self._size
+            )
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+        self._executor.shutdown(wait=True)
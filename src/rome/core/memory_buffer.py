@@ -0,0 +1,136 @@
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+from .types import Memory
+from .database import DatabaseAdapter
+from .logger import rome_logger
+
+
+class MemoryWriteBuffer:
+    """
+    Groups memory inserts by table and writes each group with one
+    `create_memories` call.
+
+    A group is flushed as soon as it reaches `max_batch` memories, and every
+    group is flushed `flush_interval` seconds after its first buffered insert.
+    Buffered memories are not visible to reads until flushed; call `flush()`
+    or `close()` before shutdown.
+
+    A group whose batch insert fails is kept, the flush timer is re-armed, and
+    the batch is retried on later flushes; `add` logs such a failure rather
+    than raising, since the memory is already queued for the retry.
+    After `max_retries` failed attempts its memories are inserted one at a
+    time instead, and any memory that still fails is logged and moved to
+    `dead_letters` so one bad row cannot block the rest of its table.
+    """
+
+    def __init__(self, adapter: DatabaseAdapter, max_batch: int = 256, flush_interval: float = 0.5,
+                 max_retries: int = 3):
+        self.adapter = adapter
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.dead_letters: List[Tuple[Memory, str, Exception]] = []
+        self._groups: Dict[Tuple[str, bool], List[Memory]] = {}
+        self._failures: Dict[Tuple[str, bool], int] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def pending(self) -> int:
+        return sum(len(group) for group in self._groups.values())
+
+    async def add(self, memory: Memory, table_name: str, unique: bool = False) -> None:
+        key = (table_name, unique)
+        group = self._groups.setdefault(key, [])
+        group.append(memory)
+        if len(group) >= self.max_batch:
+            try:
+                await self._flush_group(key)
+            except Exception as error:
+                rome_logger.error(f"Memory write buffer flush of {table_name} failed, will retry: {error}")
+        else:
+            self._schedule()
+
+    def _schedule(self) -> None:
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        if self._flush_task is asyncio.current_task():
+            # Past the sleep, so a group put back during this flush arms a fresh timer
+            self._flush_task = None
+        try:
+            # Shielded so close() cancelling the timer cannot interrupt a write
+            await asyncio.shield(self.flush())
+        except Exception as error:
+            rome_logger.error(f"Memory write buffer flush failed: {error}")
+
+    async def _flush_group(self, key: Tuple[str, bool]) -> int:
+        async with self._lock:
+            batch = self._groups.pop(key, None)
+            if not batch:
+                return 0
+            table_name, unique = key
+            try:
+                await self.adapter.create_memories(batch, table_name, unique)
+            except Exception:
+                failures = self._failures[key] = self._failures.get(key, 0) + 1
+                if failures < self.max_retries:
+                    # Put the batch back ahead of anything buffered meanwhile
+                    self._groups[key] = batch + self._groups.get(key, [])
+                    self._schedule()
+                    raise
+                self._failures.pop(key, None)
+                return await self._write_each(batch, table_name, unique)
+            self._failures.pop(key, None)
+            return len(batch)
+
+    async def _write_each(self, batch: List[Memory], table_name: str, unique: bool) -> int:
+        """Insert a repeatedly failing batch row by row, dead-lettering the rows that fail"""
+        written = 0
+        for memory in batch:
+            try:
+                await self.adapter.create_memories([memory], table_name, unique)
+                written += 1
+            except Exception as error:
+                rome_logger.error(f"Dropping memory {memory.id} from {table_name} write buffer: {error}")
+                self.dead_letters.append((memory, table_name, error))
+        return written
+
+    async def flush(self) -> int:
+        """
+        Write every buffered group, returning the number of memories written.
+
+        A failing group does not stop the others; the first error is raised
+        once every group has been attempted.
+        """
+        written = 0
+        failure: Optional[Exception] = None
+        for key in list(self._groups):
+            try:
+                written += await self._flush_group(key)
+            except Exception as error:
+                rome_logger.error(f"Memory write buffer flush of {key[0]} failed: {error}")
+                failure = failure or error
+        if failure is not None:
+            raise failure
+        return written
+
+    async def close(self) -> int:
+        """Cancel the pending timer and flush everything still buffered"""
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        self._flush_task = None
+        try:
+            return await self.flush()
+        finally:
+            # Groups put back by a failed flush re-arm the timer; nothing should outlive close()
+            if self._flush_task is not None:
+                self._flush_task.cancel()
+                self._flush_task = None
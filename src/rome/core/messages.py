@@ -1,27 +1,29 @@
-from typing import List, Optional
+from collections import OrderedDict
+from typing import Collection, Dict, List, Optional, Tuple
 from uuid import UUID
-import asyncio
 from datetime import datetime
 from .types import IAgentRuntime, Actor, Memory, Content, Media
+from .tokens import TokenCounter
 
 async def get_actor_details(runtime: IAgentRuntime, 
                           roomId: UUID) -> List[Actor]:
     """Get details for a list of actors."""
+    if runtime.actorCache is not None:
+        return await runtime.actorCache.get_actors(roomId)
+
     participant_ids = await runtime.databaseAdapter.getParticipantsForRoom(roomId)
-    
-    async def get_actor(userId: UUID):
-        account = await runtime.databaseAdapter.getAccountById(userId)
-        if account:
-            return Actor(
-                id=account.id,
-                name=account.name,
-                username=account.username,
-                details=account.details
-            )
-        return None
-    
-    actors = await asyncio.gather(*[get_actor(uid) for uid in participant_ids])
-    return [a for a in actors if a is not None]
+    accounts = await runtime.databaseAdapter.getAccountsByIds(participant_ids)
+    by_id = {account.id: account for account in accounts}
+    return [
+        Actor(
+            id=account.id,
+            name=account.name,
+            username=account.username,
+            details=account.details
+        )
+        for account in (by_id.get(uid) for uid in participant_ids)
+        if account is not None
+    ]
 
 def format_actors(actors: List[Actor]) -> str:
     """Format actors into a string."""
@@ -36,57 +38,159 @@ def format_actors(actors: List[Actor]) -> str:
     
     return "\n".join(actor_strings)
 
-def format_messages(messages: List[Memory], actors: List[Actor]) -> str:
-    """Format messages into a string."""
-    def format_msg(message: Memory) -> str:
-        if not message.userId:
-            return ""
-            
+class MessageFormatter:
+    """
+    Incremental renderer for the recentMessages block.
+
+    The part of each line after the timestamp is cached per memory id, and the
+    timestamp bucket ("5 minutes ago") is cached with the time it stops being
+    current. Rendering a room again only formats memories not seen before and
+    refreshes buckets that have rolled over. Actors are looked up by id.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        # (memory id, with attachments) -> [actor name, body, bucket label, bucket valid until]
+        self._lines: "OrderedDict[Tuple[UUID, bool], list]" = OrderedDict()
+
+    @staticmethod
+    def _render_body(message: Memory, name: str, attachments: bool) -> str:
         content = message.content
-        message_content = content.text
-        message_action = content.action
-        
-        actor = next((a for a in actors if a.id == message.userId), None)
-        formatted_name = actor.name if actor else "Unknown User"
-        
         attachment_str = ""
-        if content.attachments:
-            attachments = [
-                f"[{m.id} - {m.title} ({m.url})]" 
+        if attachments and content.attachments:
+            items = [
+                f"[{m.id} - {m.title} ({m.url})]"
                 for m in content.attachments
             ]
-            attachment_str = f" (Attachments: {', '.join(attachments)})"
-            
-        timestamp = format_timestamp(message.createdAt) if message.createdAt else ""
+            attachment_str = f" (Attachments: {', '.join(items)})"
         short_id = str(message.userId)[-5:]
-        
-        action_str = f" ({message_action})" if message_action and message_action != "null" else ""
-        
-        return f"({timestamp}) [{short_id}] {formatted_name}: {message_content}{attachment_str}{action_str}"
-    
-    message_strings = [
-        format_msg(msg) for msg in reversed(messages) 
-        if msg.userId
-    ]
-    
-    return "\n".join(msg for msg in message_strings if msg)
+        action = content.action
+        action_str = f" ({action})" if action and action != "null" else ""
+        return f"[{short_id}] {name}: {content.text}{attachment_str}{action_str}"
 
-def format_timestamp(message_date: float) -> str:
-    """Format timestamp into readable string."""
-    now = datetime.now().timestamp() * 1000
+    def _entry(self, message: Memory, name: str, attachments: bool) -> list:
+        key = (message.id, attachments) if message.id is not None else None
+        entry = self._lines.get(key) if key is not None else None
+        if entry is None or entry[0] != name:
+            entry = [name, self._render_body(message, name, attachments), None, 0.0]
+            if key is not None:
+                self._lines[key] = entry
+                if len(self._lines) > self.max_entries:
+                    self._lines.popitem(last=False)
+        elif key is not None:
+            self._lines.move_to_end(key)
+        return entry
+
+    def body(self, message: Memory, name: str, attachments: bool = True) -> str:
+        """A message's line without the leading timestamp"""
+        return self._entry(message, name, attachments)[1]
+
+    def _line(self, message: Memory, names: Dict[UUID, str], now: float, attachments: bool) -> str:
+        entry = self._entry(message, names.get(message.userId, "Unknown User"), attachments)
+        if not message.createdAt:
+            entry[2] = ""
+        elif entry[2] is None or now >= entry[3]:
+            entry[2], entry[3] = _timestamp_bucket(message.createdAt, now)
+        return f"({entry[2]}) {entry[1]}"
+
+    def format(self, messages: List[Memory], actors: List[Actor], now: Optional[float] = None,
+               without_attachments: Collection[UUID] = ()) -> str:
+        """
+        Same output as format_messages: messages newest first in, oldest first
+        out. Messages whose ids are in `without_attachments` omit their attachments.
+        """
+        names = {actor.id: actor.name for actor in actors}
+        now = datetime.now().timestamp() * 1000 if now is None else now
+        return "\n".join(
+            self._line(message, names, now, message.id not in without_attachments)
+            for message in reversed(messages) if message.userId
+        )
+
+    def clear(self) -> None:
+        self._lines.clear()
+
+
+_formatter = MessageFormatter()
+_token_counter = TokenCounter()
+
+
+def format_messages(messages: List[Memory], actors: List[Actor]) -> str:
+    """Format messages into a string."""
+    return _formatter.format(messages, actors)
+
+
+# Allowance for the "(5 minutes ago) " prefix, which is not counted per memory
+TIMESTAMP_TOKENS = 5
+
+
+def build_conversation_window(messages: List[Memory], actors: List[Actor], max_tokens: int,
+                              counter: Optional[TokenCounter] = None,
+                              formatter: Optional[MessageFormatter] = None,
+                              now: Optional[float] = None) -> Tuple[List[Memory], str]:
+    """
+    Fit recent messages into a token budget.
+
+    Messages (newest first, as returned by getMemories) are kept newest-first
+    while their lines fit in `max_tokens` with attachments stripped; spare
+    budget then restores attachments, newest first. Attachments are therefore
+    dropped before any message is. Per-memory token counts are cached by
+    `counter`. Returns the kept messages, newest first, and their formatted text.
+    """
+    counter = counter or _token_counter
+    formatter = formatter or _formatter
+    names = {actor.id: actor.name for actor in actors}
+    kept: List[Memory] = []
+    extras: List[Tuple[Memory, int]] = []
+    used = 0
+    for message in messages:
+        if not message.userId:
+            continue
+        name = names.get(message.userId, "Unknown User")
+        key = (message.id, name) if message.id is not None else None
+        cost = TIMESTAMP_TOKENS + counter.count(
+            formatter.body(message, name, attachments=False), key and (*key, False)
+        )
+        if used + cost > max_tokens:
+            break
+        used += cost
+        kept.append(message)
+        if message.content.attachments:
+            full = TIMESTAMP_TOKENS + counter.count(
+                formatter.body(message, name), key and (*key, True)
+            )
+            extras.append((message, full - cost))
+    stripped = set()
+    for message, extra in extras:
+        if used + extra <= max_tokens:
+            used += extra
+        else:
+            stripped.add(message.id)
+    return kept, formatter.format(kept, actors, now=now, without_attachments=stripped)
+
+
+def _timestamp_bucket(message_date: float, now: float) -> Tuple[str, float]:
+    """format_timestamp's label plus the time (ms) at which the label changes"""
     diff = now - message_date
-    
+
     abs_diff = abs(diff)
     seconds = int(abs_diff / 1000)
     minutes = int(seconds / 60)
-    hours = int(minutes / 60) 
+    hours = int(minutes / 60)
     days = int(hours / 24)
-    
+
     if abs_diff < 60000:
-        return "just now"
+        label, boundary = "just now", 60000
     elif minutes < 60:
-        return f"{minutes} minute{'s' if minutes != 1 else ''} ago"
+        label, boundary = f"{minutes} minute{'s' if minutes != 1 else ''} ago", (minutes + 1) * 60000
     elif hours < 24:
-        return f"{hours} hour{'s' if hours != 1 else ''} ago"
+        label, boundary = f"{hours} hour{'s' if hours != 1 else ''} ago", (hours + 1) * 3600000
     else:
-        return f"{days} day{'s' if days != 1 else ''} ago"
\ No newline at end of file
+        label, boundary = f"{days} day{'s' if days != 1 else ''} ago", (days + 1) * 86400000
+    # Future timestamps count down rather than up, so recompute them every time
+    return label, (message_date + boundary if diff >= 0 else now)
+
+
+def format_timestamp(message_date: float) -> str:
+    """Format timestamp into readable string."""
+    now = datetime.now().timestamp() * 1000
+    return _timestamp_bucket(message_date, now)[0]
@@ -1,31 +1,166 @@
-from typing import Optional
-from .types import IAgentRuntime, Memory
+import asyncio
+from dataclasses import dataclass
+import time
+from typing import Any, Awaitable, Dict, List, Optional
+from .types import CacheOptions, IAgentRuntime, Memory, Provider
+from .logger import rome_logger
+
+
+@dataclass
+class ProviderStats:
+    calls: int = 0
+    timeouts: int = 0
+    errors: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+
+    @property
+    def avg_ms(self) -> float:
+        completed = self.calls - self.timeouts
+        return self.total_ms / completed if completed else 0.0
+
+
+class ProviderExecutor:
+    """
+    Runs providers concurrently under deadlines.
+
+    Each provider gets `timeout` seconds (or its own `Provider.timeout`), and
+    the whole run gets `deadline` seconds. Providers still running at the
+    deadline are cancelled; with `partial` their results are simply missing,
+    otherwise the run raises asyncio.TimeoutError. A provider that times out
+    or raises contributes None. Latency, timeouts and errors are counted per
+    provider in `stats`.
+
+    Providers that set `cacheTtl` are served from `runtime.cacheManager`
+    under their `name` and `cacheKey(runtime, message, state)`, by default
+    one entry per agent and room; a cached provider without a name fails
+    rather than risk sharing entries with another provider. Concurrent misses share a single call to the provider, and a
+    caller that times out leaves that call running to fill the cache.
+    """
+
+    def __init__(self, timeout: Optional[float] = None, deadline: Optional[float] = None,
+                 partial: bool = True):
+        self.timeout = timeout
+        self.deadline = deadline
+        self.partial = partial
+        self.stats: Dict[str, ProviderStats] = {}
+
+    @staticmethod
+    def provider_name(provider: Provider) -> str:
+        return provider.name or getattr(provider.get, "__qualname__", repr(provider.get))
+
+    async def _call(self, provider: Provider, name: str, runtime: IAgentRuntime,
+                    message: Memory, state: Optional[dict]) -> Any:
+        stats = self.stats.setdefault(name, ProviderStats())
+        stats.calls += 1
+        timeout = provider.timeout if provider.timeout is not None else self.timeout
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(self._fetch(provider, name, runtime, message, state, timeout), timeout)
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            rome_logger.warning(f"Provider {name} timed out after {timeout}s")
+            return None
+        except Exception as error:
+            stats.errors += 1
+            rome_logger.error(f"Provider {name} failed: {error}")
+            result = None
+        elapsed = (time.monotonic() - started) * 1000
+        stats.total_ms += elapsed
+        stats.max_ms = max(stats.max_ms, elapsed)
+        return result
+
+    @staticmethod
+    def cache_key(provider: Provider, name: str, runtime: IAgentRuntime,
+                  message: Memory, state: Optional[dict]) -> str:
+        if provider.cacheKey is not None:
+            return f"provider:{name}:{provider.cacheKey(runtime, message, state)}"
+        return f"provider:{name}:{runtime.agentId}:{message.roomId}"
+
+    def _fetch(self, provider: Provider, name: str, runtime: IAgentRuntime,
+               message: Memory, state: Optional[dict], timeout: Optional[float]) -> Awaitable[Any]:
+        cache_manager = getattr(runtime, "cacheManager", None)
+        if not provider.cacheTtl or cache_manager is None:
+            return provider.get(runtime, message, state)
+        if not provider.name:
+            raise ValueError(f"Provider {name} sets cacheTtl but has no name to key its cache entries")
+        return cache_manager.get_or_compute(
+            self.cache_key(provider, name, runtime, message, state),
+            lambda: asyncio.wait_for(provider.get(runtime, message, state), timeout),
+            CacheOptions(ttl=provider.cacheTtl),
+            stale_while_revalidate=provider.cacheStale
+        )
+
+    async def run(self, runtime: IAgentRuntime, message: Memory,
+                  state: Optional[dict] = None) -> List[Any]:
+        """Provider results in `runtime.providers` order; None where none was produced"""
+        providers = list(runtime.providers)
+        if not providers:
+            return []
+        tasks = [
+            asyncio.ensure_future(self._call(provider, self.provider_name(provider), runtime, message, state))
+            for provider in providers
+        ]
+        try:
+            done, pending = await asyncio.wait(tasks, timeout=self.deadline)
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            raise
+        names = []
+        for provider, task in zip(providers, tasks):
+            if task in pending:
+                task.cancel()
+                name = self.provider_name(provider)
+                self.stats.setdefault(name, ProviderStats()).timeouts += 1
+                names.append(name)
+        if names:
+            rome_logger.warning(f"Provider deadline of {self.deadline}s cancelled: {', '.join(names)}")
+            if not self.partial:
+                raise asyncio.TimeoutError(f"Providers missed the {self.deadline}s deadline: {', '.join(names)}")
+        return [task.result() if task in done else None for task in tasks]
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: {
+                "calls": stats.calls,
+                "timeouts": stats.timeouts,
+                "errors": stats.errors,
+                "avg_ms": stats.avg_ms,
+                "max_ms": stats.max_ms,
+            }
+            for name, stats in self.stats.items()
+        }
+
+
+_default_executor = ProviderExecutor()
+
 
 async def get_providers(
     runtime: IAgentRuntime,
-    message: Memory, 
-    state: Optional[dict] = None
+    message: Memory,
+    state: Optional[dict] = None,
+    executor: Optional[ProviderExecutor] = None
 ) -> str:
     """
     Formats provider outputs into a string for context injection.
-    
+
     Args:
         runtime: The AgentRuntime object
         message: The incoming message object
         state: The current state object
-        
+        executor: Executor applying deadlines; defaults to runtime.providerExecutor
+
     Returns:
         String concatenating outputs of each provider
     """
-    provider_results = await asyncio.gather(*[
-        provider.get(runtime, message, state)
-        for provider in runtime.providers
-    ])
-    
+    executor = executor or getattr(runtime, "providerExecutor", None) or _default_executor
+    provider_results = await executor.run(runtime, message, state)
+
     # Filter out None and empty strings
     filtered_results = [
-        result for result in provider_results 
+        result for result in provider_results
         if result is not None and result != ""
     ]
-    
-    return "\n".join(filtered_results)
\ No newline at end of file
+
+    return "\n".join(filtered_results)
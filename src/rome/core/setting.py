@@ -4,7 +4,7 @@ from pathlib import Path
 from typing import Dict, Optional
 from dotenv import load_dotenv
 
-from logger import rome_logger
+from .logger import rome_logger
 
 class Settings:
     def __init__(self):
@@ -0,0 +1,938 @@
+import asyncio
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+import heapq
+import itertools
+import json
+import sqlite3
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+from uuid import UUID, uuid4
+
+from .types import (
+    Account, AccountDetails, Content, Goal, GoalStatus, IDatabaseCacheAdapter,
+    Media, Memory, Objective, Relationship
+)
+from .database import DatabaseAdapter
+from .embedding import CompactEmbedding
+from .vector_index import VectorIndex
+from .ann_index import IVFIndex
+from .dedup import DedupIndex
+from .lexical_index import LexicalIndex, reciprocal_rank_fusion
+from .logger import rome_logger
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    id TEXT PRIMARY KEY,
+    createdAt REAL NOT NULL,
+    name TEXT,
+    username TEXT,
+    email TEXT,
+    avatarUrl TEXT,
+    details TEXT
+);
+CREATE TABLE IF NOT EXISTS memories (
+    id TEXT PRIMARY KEY,
+    tableName TEXT NOT NULL,
+    createdAt REAL NOT NULL,
+    content TEXT NOT NULL,
+    embedding BLOB,
+    userId TEXT,
+    roomId TEXT,
+    agentId TEXT,
+    isUnique INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_memories_room_created ON memories (roomId, createdAt);
+CREATE INDEX IF NOT EXISTS idx_memories_room_table_created ON memories (roomId, tableName, createdAt, id);
+CREATE INDEX IF NOT EXISTS idx_memories_agent_table ON memories (agentId, tableName);
+CREATE TABLE IF NOT EXISTS goals (
+    id TEXT PRIMARY KEY,
+    createdAt REAL NOT NULL,
+    userId TEXT,
+    name TEXT,
+    status TEXT,
+    roomId TEXT,
+    objectives TEXT NOT NULL DEFAULT '[]'
+);
+CREATE INDEX IF NOT EXISTS idx_goals_room ON goals (roomId, status);
+CREATE TABLE IF NOT EXISTS rooms (
+    id TEXT PRIMARY KEY,
+    createdAt REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS participants (
+    id TEXT PRIMARY KEY,
+    createdAt REAL NOT NULL,
+    userId TEXT NOT NULL,
+    roomId TEXT NOT NULL,
+    UNIQUE (userId, roomId)
+);
+CREATE INDEX IF NOT EXISTS idx_participants_room ON participants (roomId);
+CREATE TABLE IF NOT EXISTS relationships (
+    id TEXT PRIMARY KEY,
+    createdAt REAL NOT NULL,
+    userA TEXT NOT NULL,
+    userB TEXT NOT NULL,
+    status TEXT,
+    userId TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_relationships_users ON relationships (userA, userB);
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT NOT NULL,
+    agentId TEXT NOT NULL,
+    value TEXT,
+    createdAt REAL NOT NULL,
+    PRIMARY KEY (key, agentId)
+);
+"""
+
+# Stay well under SQLite's bound-parameter limit for IN (...) lists
+MAX_VARIABLES = 500
+
+# Statements are module constants so each pooled connection's statement cache
+# reuses the compiled form instead of re-preparing them per call.
+SQL_ACCOUNT_COLUMNS = "id, name, username, email, avatarUrl, details"
+SQL_GET_ACCOUNT = f"SELECT {SQL_ACCOUNT_COLUMNS} FROM accounts WHERE id = ?"
+SQL_UPDATE_ACCOUNT = (
+    "UPDATE accounts SET name = ?, username = ?, email = ?, avatarUrl = ?, details = ? WHERE id = ?"
+)
+SQL_INSERT_ACCOUNT = (
+    "INSERT INTO accounts (id, createdAt, name, username, email, avatarUrl, details) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+SQL_INSERT_MEMORY = (
+    "INSERT INTO memories (id, tableName, createdAt, content, embedding, userId, roomId, agentId, isUnique) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+SQL_MEMORY_COLUMNS = "id, createdAt, content, embedding, userId, roomId, agentId, isUnique"
+SQL_MEMORY_COLUMNS_NO_EMBEDDING = "id, createdAt, content, NULL, userId, roomId, agentId, isUnique"
+SQL_INSERT_GOAL = (
+    "INSERT INTO goals (id, createdAt, userId, name, status, roomId, objectives) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+SQL_UPDATE_GOAL = "UPDATE goals SET name = ?, status = ?, objectives = ? WHERE id = ?"
+SQL_LOAD_DEDUP = (
+    "SELECT id, content, embedding, roomId, agentId FROM memories WHERE tableName = ? AND isUnique = 1"
+)
+SQL_LOAD_LEXICAL = "SELECT id, content, roomId, agentId, isUnique FROM memories WHERE tableName = ?"
+SQL_LOAD_EMBEDDINGS = (
+    "SELECT id, embedding, roomId, agentId, isUnique FROM memories "
+    "WHERE tableName = ? AND embedding IS NOT NULL"
+)
+SQL_GET_ROOM = "SELECT id FROM rooms WHERE id = ?"
+SQL_INSERT_ROOM = "INSERT OR IGNORE INTO rooms (id, createdAt) VALUES (?, ?)"
+SQL_GET_PARTICIPANTS = "SELECT userId FROM participants WHERE roomId = ?"
+SQL_INSERT_PARTICIPANT = (
+    "INSERT OR IGNORE INTO participants (id, createdAt, userId, roomId) VALUES (?, ?, ?, ?)"
+)
+SQL_INSERT_RELATIONSHIP = (
+    "INSERT INTO relationships (id, createdAt, userA, userB, status, userId) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+SQL_GET_RELATIONSHIP = (
+    "SELECT id, userA, userB, userId, status, createdAt FROM relationships "
+    "WHERE (userA = ? AND userB = ?) OR (userA = ? AND userB = ?)"
+)
+SQL_GET_RELATIONSHIPS = (
+    "SELECT id, userA, userB, userId, status, createdAt FROM relationships "
+    "WHERE userA = ? OR userB = ?"
+)
+SQL_GET_CACHE = "SELECT value FROM cache WHERE key = ? AND agentId = ?"
+SQL_SET_CACHE = "INSERT OR REPLACE INTO cache (key, agentId, value, createdAt) VALUES (?, ?, ?, ?)"
+SQL_DELETE_CACHE = "DELETE FROM cache WHERE key = ? AND agentId = ?"
+
+
+def _now() -> float:
+    return time.time() * 1000
+
+
+def _str(value: Optional[Any]) -> Optional[str]:
+    return str(value) if value is not None else None
+
+
+def _uuid(value: Optional[str]) -> Optional[UUID]:
+    return UUID(value) if value else None
+
+
+def _placeholders(count: int) -> str:
+    return ", ".join("?" * count)
+
+
+def _content_to_json(content: Content) -> str:
+    data = asdict(content)
+    data['inReplyTo'] = _str(content.inReplyTo)
+    return json.dumps(data)
+
+
+def _content_from_json(data: str) -> Content:
+    raw = json.loads(data)
+    return Content(
+        text=raw.get('text', ''),
+        action=raw.get('action'),
+        source=raw.get('source'),
+        url=raw.get('url'),
+        inReplyTo=_uuid(raw.get('inReplyTo')),
+        attachments=[Media(**m) for m in raw.get('attachments') or []],
+        extra=raw.get('extra') or {}
+    )
+
+
+def _embedding_to_blob(embedding: Optional[Union[List[float], CompactEmbedding]],
+                       dtype: str = 'float32') -> Optional[bytes]:
+    if embedding is None:
+        return None
+    return CompactEmbedding.from_floats(embedding, dtype).to_bytes()
+
+
+def _embedding_from_blob(blob: Optional[bytes]) -> Optional[CompactEmbedding]:
+    if blob is None:
+        return None
+    if CompactEmbedding.is_serialized(blob):
+        return CompactEmbedding.from_bytes(blob)
+    # Rows written before CompactEmbedding stored bare float32 values
+    values = array('f')
+    values.frombytes(blob)
+    return CompactEmbedding.from_floats(values)
+
+
+def _row_to_memory(row: tuple) -> Memory:
+    id_, created_at, content, embedding, user_id, room_id, agent_id, unique = row
+    return Memory(
+        id=_uuid(id_),
+        userId=_uuid(user_id),
+        agentId=_uuid(agent_id),
+        createdAt=created_at,
+        content=_content_from_json(content),
+        embedding=_embedding_from_blob(embedding),
+        roomId=_uuid(room_id),
+        unique=bool(unique)
+    )
+
+
+def _keyset(row: tuple) -> tuple:
+    """(createdAt, id) of a memory row, the order iter_memories pages in"""
+    return row[1], row[0]
+
+
+def _row_to_account(row: tuple) -> Account:
+    id_, name, username, email, avatar_url, details = row
+    return Account(
+        id=_uuid(id_),
+        name=name,
+        username=username,
+        details=AccountDetails(**json.loads(details)) if details else None,
+        email=email,
+        avatarUrl=avatar_url
+    )
+
+
+def _row_to_relationship(row: tuple) -> Relationship:
+    id_, user_a, user_b, user_id, status, created_at = row
+    return Relationship(
+        id=_uuid(id_),
+        userA=_uuid(user_a),
+        userB=_uuid(user_b),
+        userId=_uuid(user_id),
+        roomId=None,
+        status=status,
+        createdAt=str(created_at) if created_at is not None else None
+    )
+
+
+def _is_database_failure(error: Exception) -> bool:
+    """Constraint violations are the caller's doing, not a sign the database is unhealthy"""
+    return not isinstance(error, sqlite3.IntegrityError)
+
+
+class SqliteDatabaseAdapter(DatabaseAdapter, IDatabaseCacheAdapter):
+    """
+    Reference DatabaseAdapter backed by SQLite.
+
+    Runs in WAL mode with a small pool of connections, each used by one worker
+    thread at a time so queries never block the event loop. Tables listed in
+    `ann_tables` (tableName -> IVFIndex options) are searched with an
+    approximate IVF index instead of the exact VectorIndex; one that reaches its
+    training size, on load or through inserts, is trained in a worker thread
+    and answers exactly until training finishes. Embeddings are
+    stored, returned and searched as CompactEmbedding in `embedding_dtype`
+    ('float32', 'float16' or 'int8'). Unique inserts are checked against a
+    per-table DedupIndex, configured by `dedup_options`, rather than a full
+    vector search.
+    """
+
+    def __init__(self, path: str = "rome.db", pool_size: int = 4,
+                 circuit_breaker_config: Optional[Dict] = None,
+                 unique_threshold: float = 0.95,
+                 ann_tables: Optional[Dict[str, Dict[str, Any]]] = None,
+                 embedding_dtype: str = 'float32',
+                 dedup_options: Optional[Dict[str, Any]] = None):
+        super().__init__({'is_failure': _is_database_failure, **(circuit_breaker_config or {})})
+        self.path = path
+        # An in-memory database only exists for the connection that created it
+        self.pool_size = 1 if path == ":memory:" else pool_size
+        self.unique_threshold = unique_threshold
+        self.ann_tables = ann_tables or {}
+        self.embedding_dtype = embedding_dtype
+        self.dedup_options = {'embedding_threshold': unique_threshold, **(dedup_options or {})}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pool: Optional[asyncio.Queue] = None
+        self._connections: List[sqlite3.Connection] = []
+        self._vectors: Dict[str, VectorIndex] = {}
+        self._dedup: Dict[str, DedupIndex] = {}
+        self._lexical: Dict[str, LexicalIndex] = {}
+        # (index kind, table) -> lock held while that index loads or takes new rows
+        self._index_locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+        self._training: Dict[str, asyncio.Task] = {}
+
+    #
+    # Connection pool
+    #
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False,
+                               isolation_level=None, cached_statements=256)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    async def _run(self, fn: Callable[[sqlite3.Connection], Any], context: str) -> Any:
+        """Run `fn(connection)` on a pooled connection in a worker thread"""
+        # The limiter sees only the time spent in the worker, not the wait for a connection
+        timing: Dict[str, float] = {}
+
+        def timed(conn: sqlite3.Connection) -> Any:
+            started = time.perf_counter()
+            try:
+                return fn(conn)
+            finally:
+                timing['ms'] = (time.perf_counter() - started) * 1000
+
+        async def operation():
+            conn = await self._pool.get()
+            try:
+                future = asyncio.get_running_loop().run_in_executor(self._executor, timed, conn)
+            except BaseException:
+                self._pool.put_nowait(conn)
+                raise
+
+            def release(done: asyncio.Future) -> None:
+                # The worker thread is finished with the connection only now,
+                # which is later than the caller if the caller was cancelled
+                self._pool.put_nowait(conn)
+                if not done.cancelled():
+                    done.exception()
+
+            future.add_done_callback(release)
+            return await asyncio.shield(future)
+        return await self.with_circuit_breaker(operation, context, lambda: timing.get('ms'))
+
+    async def _transaction(self, fn: Callable[[sqlite3.Connection], Any], context: str) -> Any:
+        def run(conn: sqlite3.Connection):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(conn)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return result
+        return await self._run(run, context)
+
+    async def init(self) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=self.pool_size,
+                                            thread_name_prefix="rome-sqlite")
+        loop = asyncio.get_running_loop()
+        self._pool = asyncio.Queue()
+        for _ in range(self.pool_size):
+            conn = await loop.run_in_executor(self._executor, self._connect)
+            self._connections.append(conn)
+            self._pool.put_nowait(conn)
+        self.db = self._connections[0]
+        await self._run(lambda conn: conn.executescript(SCHEMA), "init")
+        rome_logger.debug(f"SQLite database ready at {self.path} ({self.pool_size} connections)")
+
+    async def close(self) -> None:
+        for task in self._training.values():
+            task.cancel()
+        self._training = {}
+        for conn in self._connections:
+            conn.close()
+        self._connections = []
+        self.db = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    #
+    # Accounts
+    #
+
+    async def get_account_by_id(self, user_id: UUID) -> Optional[Account]:
+        row = await self._run(
+            lambda conn: conn.execute(SQL_GET_ACCOUNT, (str(user_id),)).fetchone(),
+            "get_account_by_id"
+        )
+        return _row_to_account(row) if row else None
+
+    async def get_accounts_by_ids(self, user_ids: List[UUID]) -> List[Account]:
+        ids = list(dict.fromkeys(str(user_id) for user_id in user_ids))
+
+        def run(conn: sqlite3.Connection) -> List[tuple]:
+            rows = []
+            for i in range(0, len(ids), MAX_VARIABLES):
+                chunk = ids[i:i + MAX_VARIABLES]
+                sql = f"SELECT {SQL_ACCOUNT_COLUMNS} FROM accounts WHERE id IN ({_placeholders(len(chunk))})"
+                rows.extend(conn.execute(sql, chunk).fetchall())
+            return rows
+        rows = await self._run(run, "get_accounts_by_ids") if ids else []
+        by_id = {row[0]: _row_to_account(row) for row in rows}
+        return [by_id[id_] for id_ in ids if id_ in by_id]
+
+    async def create_account(self, account: Account) -> bool:
+        details = json.dumps(asdict(account.details)) if account.details else None
+        args = (str(account.id or uuid4()), _now(), account.name, account.username,
+                account.email, account.avatarUrl, details)
+        try:
+            await self._run(lambda conn: conn.execute(SQL_INSERT_ACCOUNT, args), "create_account")
+            # Caches may hold a miss for this id
+            self._invalidate('account', _uuid(args[0]))
+            return True
+        except sqlite3.IntegrityError as error:
+            rome_logger.error(f"Error creating account: {error}")
+            return False
+
+    async def update_account(self, account: Account) -> bool:
+        details = json.dumps(asdict(account.details)) if account.details else None
+        args = (account.name, account.username, account.email, account.avatarUrl,
+                details, str(account.id))
+        updated = await self._run(
+            lambda conn: conn.execute(SQL_UPDATE_ACCOUNT, args).rowcount, "update_account"
+        )
+        if updated:
+            self._invalidate('account', account.id)
+        return updated > 0
+
+    #
+    # Memories
+    #
+
+    async def get_memories(self, params: Dict) -> List[Memory]:
+        sql = f"SELECT {SQL_MEMORY_COLUMNS} FROM memories WHERE roomId = ? AND tableName = ?"
+        args: List[Any] = [str(params['roomId']), params['tableName']]
+        if params.get('agentId'):
+            sql += " AND agentId = ?"
+            args.append(str(params['agentId']))
+        if params.get('unique'):
+            sql += " AND isUnique = 1"
+        if params.get('start') is not None:
+            sql += " AND createdAt >= ?"
+            args.append(params['start'])
+        if params.get('end') is not None:
+            sql += " AND createdAt <= ?"
+            args.append(params['end'])
+        sql += " ORDER BY createdAt DESC"
+        if params.get('count'):
+            sql += " LIMIT ?"
+            args.append(params['count'])
+        rows = await self._run(lambda conn: conn.execute(sql, args).fetchall(), "get_memories")
+        return [_row_to_memory(row) for row in rows]
+
+    async def iter_memories(self, params: Dict, page_size: int = 100,
+                            include_embeddings: bool = True) -> AsyncIterator[Memory]:
+        """
+        Stream memories newest first with keyset pagination on (createdAt, id).
+
+        Accepts the `get_memories` filters, or `roomIds` in place of `roomId` to
+        walk several rooms as one timeline. Each page is a fresh range query on
+        a room's (roomId, tableName, createdAt, id) index, so memory use does not
+        grow with the size of the room. Several rooms are read through one
+        keyset cursor each and merged newest first, like get_memories_by_room_ids.
+        """
+        room_ids = list(dict.fromkeys(str(room_id) for room_id in params.get('roomIds') or [params['roomId']]))
+        columns = SQL_MEMORY_COLUMNS if include_embeddings else SQL_MEMORY_COLUMNS_NO_EMBEDDING
+        sql = f"SELECT {columns} FROM memories WHERE roomId = ? AND tableName = ?"
+        args: List[Any] = [params['tableName']]
+        if params.get('agentId'):
+            sql += " AND agentId = ?"
+            args.append(str(params['agentId']))
+        if params.get('unique'):
+            sql += " AND isUnique = 1"
+        if params.get('start') is not None:
+            sql += " AND createdAt >= ?"
+            args.append(params['start'])
+        if params.get('end') is not None:
+            sql += " AND createdAt <= ?"
+            args.append(params['end'])
+        first_sql = f"{sql} ORDER BY createdAt DESC, id DESC LIMIT ?"
+        # A row-value bound is a range on the index; an OR of two bounds is not
+        next_sql = f"{sql} AND (createdAt, id) < (?, ?) ORDER BY createdAt DESC, id DESC LIMIT ?"
+
+        async def page(room_id: str, last: Optional[tuple]) -> List[tuple]:
+            if last is None:
+                query, query_args = first_sql, [room_id, *args, page_size]
+            else:
+                query, query_args = next_sql, [room_id, *args, last[1], last[0], page_size]
+            return await self._run(
+                lambda conn: conn.execute(query, query_args).fetchall(), "iter_memories"
+            )
+
+        pages: Dict[str, List[tuple]] = {}
+        for room_id in room_ids:
+            rows = await page(room_id, None)
+            if rows:
+                pages[room_id] = rows
+        positions = dict.fromkeys(pages, 0)
+        while pages:
+            room_id = max(pages, key=lambda room: _keyset(pages[room][positions[room]]))
+            rows, position = pages[room_id], positions[room_id]
+            yield _row_to_memory(rows[position])
+            position += 1
+            if position < len(rows):
+                positions[room_id] = position
+                continue
+            more = await page(room_id, rows[-1]) if len(rows) == page_size else []
+            if more:
+                pages[room_id], positions[room_id] = more, 0
+            else:
+                del pages[room_id], positions[room_id]
+
+    async def get_memories_by_room_ids(self, params: Dict) -> List[Memory]:
+        """
+        Newest memories across several rooms, merged into one timeline.
+
+        Each room is read through its own (roomId, tableName, createdAt, id)
+        index range, newest first, and the per-room cursors are k-way merged
+        with a heap. Only about `limit` rows are read in total rather than every
+        room's history. `perRoomLimit` caps how many memories any one room contributes.
+        """
+        room_ids = list(dict.fromkeys(str(room_id) for room_id in params['roomIds']))
+        if not room_ids:
+            return []
+        sql = f"SELECT {SQL_MEMORY_COLUMNS} FROM memories WHERE roomId = ? AND tableName = ?"
+        args: List[Any] = [params['tableName']]
+        if params.get('agentId'):
+            sql += " AND agentId = ?"
+            args.append(str(params['agentId']))
+        if params.get('start') is not None:
+            sql += " AND createdAt >= ?"
+            args.append(params['start'])
+        if params.get('end') is not None:
+            sql += " AND createdAt <= ?"
+            args.append(params['end'])
+        sql += " ORDER BY createdAt DESC, id DESC"
+        limit = params.get('limit') or None
+        per_room = min(filter(None, (params.get('perRoomLimit'), limit)), default=None)
+        if per_room:
+            sql += " LIMIT ?"
+            args.append(per_room)
+
+        def run(conn: sqlite3.Connection) -> List[tuple]:
+            cursors = [conn.execute(sql, (room_id, *args)) for room_id in room_ids]
+            try:
+                merged = heapq.merge(*cursors, key=lambda row: (row[1], row[0]), reverse=True)
+                return list(itertools.islice(merged, limit))
+            finally:
+                for cursor in cursors:
+                    cursor.close()
+        rows = await self._run(run, "get_memories_by_room_ids")
+        return [_row_to_memory(row) for row in rows]
+
+    async def _vector_index(self, table_name: str) -> VectorIndex:
+        """Return the table's vector index, loading it from the database on first use"""
+        index = self._vectors.get(table_name)
+        if index is not None:
+            return index
+        async with self._index_lock('vector', table_name):
+            index = self._vectors.get(table_name)
+            if index is not None:
+                return index
+
+            def load(conn: sqlite3.Connection) -> VectorIndex:
+                if table_name in self.ann_tables:
+                    options = {'dtype': self.embedding_dtype, **self.ann_tables[table_name], 'train_inline': False}
+                    loaded = IVFIndex(**options)
+                else:
+                    loaded = VectorIndex(dtype=self.embedding_dtype)
+                rows = conn.execute(SQL_LOAD_EMBEDDINGS, (table_name,)).fetchall()
+                loaded.add_many(
+                    (id_, _embedding_from_blob(blob), room_id, agent_id, bool(unique))
+                    for id_, blob, room_id, agent_id, unique in rows
+                )
+                return loaded
+
+            index = await self._run(load, "load_vector_index")
+            self._vectors[table_name] = index
+            # Trained like any other table that reaches train_size, outside the connection pool
+            self._train_later(table_name, index)
+            return index
+
+    def _train_later(self, table_name: str, index: VectorIndex) -> None:
+        """Train an IVF index that has reached its training size in a worker thread"""
+        if not isinstance(index, IVFIndex) or not index.needs_training or table_name in self._training:
+            return
+
+        async def train() -> None:
+            try:
+                # The default executor, so a long fit never holds up queries waiting on the SQLite workers
+                fit = await asyncio.get_running_loop().run_in_executor(None, index.fit)
+                if fit is not None and not index.install(fit):
+                    rome_logger.debug(f"Discarded IVF training for {table_name}; the index was compacted meanwhile")
+            except Exception as error:
+                rome_logger.error(f"IVF training for {table_name} failed: {error}")
+            finally:
+                self._training.pop(table_name, None)
+        self._training[table_name] = asyncio.ensure_future(train())
+
+    def _index_lock(self, kind: str, table_name: str) -> asyncio.Lock:
+        lock = self._index_locks.get((kind, table_name))
+        if lock is None:
+            lock = self._index_locks[(kind, table_name)] = asyncio.Lock()
+        return lock
+
+    async def _get_memories_by_ids(self, ids: List[str], context: str) -> Dict[str, Memory]:
+        def run(conn: sqlite3.Connection) -> List[tuple]:
+            rows = []
+            for i in range(0, len(ids), MAX_VARIABLES):
+                chunk = ids[i:i + MAX_VARIABLES]
+                sql = f"SELECT {SQL_MEMORY_COLUMNS} FROM memories WHERE id IN ({_placeholders(len(chunk))})"
+                rows.extend(conn.execute(sql, chunk).fetchall())
+            return rows
+        rows = await self._run(run, context) if ids else []
+        return {row[0]: _row_to_memory(row) for row in rows}
+
+    async def search_memories(self, params: Dict) -> List[Memory]:
+        """
+        Search memories by cosine similarity to `params['embedding']`.
+
+        Accepts tableName, roomId, agentId, match_threshold, match_count and unique,
+        plus n_probe for tables configured in `ann_tables`. Scoring runs against
+        the table's in-memory index.
+
+        With `mode` 'lexical' the text in `query` is ranked by BM25 instead, and
+        with 'hybrid' the BM25 and vector rankings are fused by reciprocal rank
+        (`rrf_k`, default 60); `similarity` is then the fused score. Setting
+        `lexical_prefilter` scores vectors only for the top `lexical_count` BM25
+        hits rather than the whole table, unless there are fewer than
+        `match_count` of them, in which case every vector is scored.
+        """
+        mode = params.get('mode', 'vector')
+        if mode not in ('vector', 'lexical', 'hybrid'):
+            raise ValueError(f"Unknown search mode: {mode}")
+        count = params.get('match_count', 10)
+        filters = {
+            'room_id': _str(params.get('roomId')),
+            'agent_id': _str(params.get('agentId')),
+            'unique': bool(params.get('unique')),
+        }
+        lexical_hits: List[Tuple[str, float]] = []
+        if mode != 'vector':
+            lexical = await self._lexical_index(params['tableName'])
+            lexical_count = count if mode == 'lexical' else params.get('lexical_count', max(count * 10, 100))
+            lexical_hits = lexical.search(params.get('query', ''), k=lexical_count, **filters)
+        if mode == 'lexical':
+            hits = lexical_hits
+        else:
+            index = await self._vector_index(params['tableName'])
+            options = {}
+            if isinstance(index, IVFIndex) and params.get('n_probe'):
+                options['n_probe'] = params['n_probe']
+            if mode == 'hybrid' and params.get('lexical_prefilter') and len(lexical_hits) >= count:
+                options['candidates'] = [id_ for id_, _ in lexical_hits]
+            hits = index.search(
+                params['embedding'],
+                k=count,
+                threshold=params.get('match_threshold'),
+                **filters,
+                **options
+            )
+            if mode == 'hybrid':
+                rankings = [[id_ for id_, _ in hits], [id_ for id_, _ in lexical_hits]]
+                hits = reciprocal_rank_fusion(rankings, k=params.get('rrf_k', 60))[:count]
+        memories = await self._get_memories_by_ids([id_ for id_, _ in hits], "search_memories")
+        results = []
+        for id_, similarity in hits:
+            memory = memories.get(id_)
+            if memory is not None:
+                memory.similarity = similarity
+                results.append(memory)
+        return results
+
+    async def _lexical_index(self, table_name: str) -> LexicalIndex:
+        """Return the table's BM25 index, building it from stored memories on first use"""
+        index = self._lexical.get(table_name)
+        if index is not None:
+            return index
+        async with self._index_lock('lexical', table_name):
+            index = self._lexical.get(table_name)
+            if index is not None:
+                return index
+
+            def load(conn: sqlite3.Connection) -> LexicalIndex:
+                loaded = LexicalIndex()
+                for id_, content, room_id, agent_id, unique in conn.execute(SQL_LOAD_LEXICAL, (table_name,)):
+                    loaded.add(id_, _content_from_json(content).text, room_id, agent_id, bool(unique))
+                return loaded
+            index = self._lexical[table_name] = await self._run(load, "load_lexical_index")
+            return index
+
+    def _memory_args(self, memory: Memory, table_name: str, is_unique: bool,
+                     id_: Optional[str] = None) -> tuple:
+        return (
+            id_ or str(memory.id or uuid4()), table_name, memory.createdAt or _now(),
+            _content_to_json(memory.content), _embedding_to_blob(memory.embedding, self.embedding_dtype),
+            _str(memory.userId), _str(memory.roomId), _str(memory.agentId), int(is_unique)
+        )
+
+    @staticmethod
+    def _dedup_scope(memory: Memory) -> tuple:
+        return (_str(memory.roomId), _str(memory.agentId))
+
+    async def _dedup_index(self, table_name: str) -> DedupIndex:
+        """Return the table's dedup index, building it from stored unique memories on first use"""
+        index = self._dedup.get(table_name)
+        if index is not None:
+            return index
+        async with self._index_lock('dedup', table_name):
+            index = self._dedup.get(table_name)
+            if index is not None:
+                return index
+
+            def load(conn: sqlite3.Connection) -> DedupIndex:
+                loaded = DedupIndex(**self.dedup_options)
+                for id_, content, blob, room_id, agent_id in conn.execute(SQL_LOAD_DEDUP, (table_name,)):
+                    loaded.add(id_, (room_id, agent_id), _content_from_json(content).text,
+                               _embedding_from_blob(blob))
+                return loaded
+            index = self._dedup[table_name] = await self._run(load, "load_dedup_index")
+            return index
+
+    async def _index_rows(self, table_name: str, rows: List[Tuple[tuple, Memory]]) -> None:
+        """
+        Add inserted rows to the table's vector, lexical and dedup indexes if
+        they are loaded. An index still loading is waited for under its lock,
+        so rows committed during the load are added rather than lost.
+        """
+        if ('lexical', table_name) in self._index_locks:
+            async with self._index_lock('lexical', table_name):
+                lexical = self._lexical.get(table_name)
+                if lexical is not None:
+                    for args, memory in rows:
+                        lexical.add(args[0], memory.content.text, args[6], args[7], bool(args[8]))
+        if ('dedup', table_name) in self._index_locks:
+            async with self._index_lock('dedup', table_name):
+                dedup = self._dedup.get(table_name)
+                if dedup is not None:
+                    for args, memory in rows:
+                        if args[8]:
+                            dedup.add(args[0], self._dedup_scope(memory), memory.content.text, memory.embedding)
+        if ('vector', table_name) in self._index_locks:
+            items = [
+                (args[0], memory.embedding, args[6], args[7], bool(args[8]))
+                for args, memory in rows if memory.embedding
+            ]
+            async with self._index_lock('vector', table_name):
+                index = self._vectors.get(table_name)
+                if index is not None:
+                    index.add_many(items)
+                    self._train_later(table_name, index)
+
+    async def _reserve_unique(self, table_name: str, memories: List[Memory],
+                              ids: List[str]) -> Tuple[List[bool], List[str]]:
+        """
+        Check each memory against the dedup index and add the unique ones
+        straight away, so concurrent inserts of the same text see each other.
+        Returns the unique flags and the ids reserved, to release if the insert fails.
+        """
+        dedup = await self._dedup_index(table_name)
+        flags, reserved = [], []
+        async with self._index_lock('dedup', table_name):
+            for memory, id_ in zip(memories, ids):
+                known = id_ in dedup
+                match = dedup.check_and_add(id_, self._dedup_scope(memory), memory.content.text, memory.embedding)
+                flags.append(match is None)
+                if match is None and not known:
+                    reserved.append(id_)
+        return flags, reserved
+
+    def _release_unique(self, table_name: str, reserved: List[str]) -> None:
+        dedup = self._dedup.get(table_name)
+        if dedup is not None:
+            for id_ in reserved:
+                dedup.remove(id_)
+
+    async def create_memory(self, memory: Memory, table_name: str, unique: bool = False) -> None:
+        await self.create_memories([memory], table_name, unique)
+
+    async def create_memories(self, memories: List[Memory], table_name: str, unique: bool = False) -> None:
+        """
+        Insert a batch of memories in one transaction.
+
+        With `unique`, each memory is checked against stored memories, the ones
+        before it in the same batch and any concurrent unique insert, as if
+        inserted one at a time.
+        """
+        if not memories:
+            return
+        ids = [str(memory.id or uuid4()) for memory in memories]
+        flags, reserved = [True] * len(memories), []
+        if unique:
+            flags, reserved = await self._reserve_unique(table_name, memories, ids)
+        rows = [
+            self._memory_args(memory, table_name, flag, id_)
+            for memory, flag, id_ in zip(memories, flags, ids)
+        ]
+        try:
+            if len(rows) == 1:
+                await self._run(lambda conn: conn.execute(SQL_INSERT_MEMORY, rows[0]), "create_memory")
+            else:
+                await self._transaction(lambda conn: conn.executemany(SQL_INSERT_MEMORY, rows), "create_memories")
+        except BaseException:
+            self._release_unique(table_name, reserved)
+            raise
+        await self._index_rows(table_name, list(zip(rows, memories)))
+
+    #
+    # Goals
+    #
+
+    async def get_goals(self, params: Dict) -> List[Goal]:
+        sql = "SELECT id, userId, name, status, roomId, objectives FROM goals WHERE roomId = ?"
+        args: List[Any] = [str(params['roomId'])]
+        if params.get('userId'):
+            sql += " AND userId = ?"
+            args.append(str(params['userId']))
+        if params.get('onlyInProgress', True):
+            sql += " AND status = ?"
+            args.append(GoalStatus.IN_PROGRESS.value)
+        sql += " ORDER BY createdAt"
+        if params.get('count'):
+            sql += " LIMIT ?"
+            args.append(params['count'])
+        rows = await self._run(lambda conn: conn.execute(sql, args).fetchall(), "get_goals")
+        return [
+            Goal(
+                id=_uuid(id_),
+                roomId=_uuid(room_id),
+                userId=_uuid(user_id),
+                name=name,
+                status=GoalStatus(status),
+                objectives=[Objective(**o) for o in json.loads(objectives)]
+            )
+            for id_, user_id, name, status, room_id, objectives in rows
+        ]
+
+    async def update_goal(self, goal: Goal) -> None:
+        args = (goal.name, GoalStatus(goal.status).value,
+                json.dumps([asdict(o) for o in goal.objectives]), str(goal.id))
+        await self._run(lambda conn: conn.execute(SQL_UPDATE_GOAL, args), "update_goal")
+
+    async def create_goal(self, goal: Goal) -> None:
+        args = (str(goal.id or uuid4()), _now(), _str(goal.userId), goal.name,
+                GoalStatus(goal.status).value, _str(goal.roomId),
+                json.dumps([asdict(o) for o in goal.objectives]))
+        await self._run(lambda conn: conn.execute(SQL_INSERT_GOAL, args), "create_goal")
+
+    #
+    # Rooms and participants
+    #
+
+    async def get_room(self, room_id: UUID) -> Optional[UUID]:
+        row = await self._run(
+            lambda conn: conn.execute(SQL_GET_ROOM, (str(room_id),)).fetchone(), "get_room"
+        )
+        return _uuid(row[0]) if row else None
+
+    async def create_room(self, room_id: Optional[UUID] = None) -> UUID:
+        room_id = room_id or uuid4()
+        await self._run(
+            lambda conn: conn.execute(SQL_INSERT_ROOM, (str(room_id), _now())), "create_room"
+        )
+        return room_id
+
+    async def get_participants_for_room(self, room_id: UUID) -> List[UUID]:
+        rows = await self._run(
+            lambda conn: conn.execute(SQL_GET_PARTICIPANTS, (str(room_id),)).fetchall(),
+            "get_participants_for_room"
+        )
+        return [_uuid(row[0]) for row in rows]
+
+    async def add_participant(self, user_id: UUID, room_id: UUID) -> bool:
+        args = (str(uuid4()), _now(), str(user_id), str(room_id))
+        await self._run(lambda conn: conn.execute(SQL_INSERT_PARTICIPANT, args), "add_participant")
+        self._invalidate('room', room_id)
+        return True
+
+    #
+    # Relationships
+    #
+
+    async def create_relationship(self, params: Dict) -> bool:
+        user_a, user_b = str(params['userA']), str(params['userB'])
+        args = (str(uuid4()), _now(), user_a, user_b, params.get('status'), user_a)
+        try:
+            await self._run(lambda conn: conn.execute(SQL_INSERT_RELATIONSHIP, args),
+                            "create_relationship")
+            return True
+        except sqlite3.Error as error:
+            rome_logger.error(f"Error creating relationship: {error}")
+            return False
+
+    async def get_relationship(self, params: Dict) -> Optional[Relationship]:
+        user_a, user_b = str(params['userA']), str(params['userB'])
+        row = await self._run(
+            lambda conn: conn.execute(SQL_GET_RELATIONSHIP, (user_a, user_b, user_b, user_a)).fetchone(),
+            "get_relationship"
+        )
+        return _row_to_relationship(row) if row else None
+
+    async def get_relationships(self, params: Dict) -> List[Relationship]:
+        user_id = str(params['userId'])
+        rows = await self._run(
+            lambda conn: conn.execute(SQL_GET_RELATIONSHIPS, (user_id, user_id)).fetchall(),
+            "get_relationships"
+        )
+        return [_row_to_relationship(row) for row in rows]
+
+    #
+    # IDatabaseCacheAdapter
+    #
+
+    async def getCache(self, agentId: UUID, key: str) -> Optional[str]:
+        row = await self._run(
+            lambda conn: conn.execute(SQL_GET_CACHE, (key, str(agentId))).fetchone(), "getCache"
+        )
+        return row[0] if row else None
+
+    async def setCache(self, agentId: UUID, key: str, value: str) -> bool:
+        args = (key, str(agentId), value, _now())
+        await self._run(lambda conn: conn.execute(SQL_SET_CACHE, args), "setCache")
+        return True
+
+    async def deleteCache(self, agentId: UUID, key: str) -> bool:
+        await self._run(lambda conn: conn.execute(SQL_DELETE_CACHE, (key, str(agentId))), "deleteCache")
+        return True
+
+    async def getCacheMany(self, agentId: UUID, keys: List[str]) -> Dict[str, str]:
+        def run(conn: sqlite3.Connection) -> Dict[str, str]:
+            result = {}
+            for i in range(0, len(keys), MAX_VARIABLES):
+                chunk = keys[i:i + MAX_VARIABLES]
+                sql = f"SELECT key, value FROM cache WHERE agentId = ? AND key IN ({_placeholders(len(chunk))})"
+                for key, value in conn.execute(sql, (str(agentId), *chunk)):
+                    if value is not None:
+                        result[key] = value
+            return result
+        return await self._run(run, "getCacheMany") if keys else {}
+
+    async def setCacheMany(self, agentId: UUID, entries: Dict[str, str]) -> bool:
+        now = _now()
+        args = [(key, str(agentId), value, now) for key, value in entries.items()]
+        await self._transaction(lambda conn: conn.executemany(SQL_SET_CACHE, args), "setCacheMany")
+        return True
+
+    async def deleteCacheMany(self, agentId: UUID, keys: List[str]) -> bool:
+        args = [(key, str(agentId)) for key in keys]
+        await self._transaction(lambda conn: conn.executemany(SQL_DELETE_CACHE, args), "deleteCacheMany")
+        return True
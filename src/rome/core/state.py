@@ -0,0 +1,245 @@
+import asyncio
+import inspect
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from .types import Goal, IAgentRuntime, Memory, ModelSettings
+from .actions import compose_action_examples, format_action_names, format_actions
+from .context import compose_context, template_keys
+from .logger import rome_logger
+from .messages import build_conversation_window, format_actors, format_messages, get_actor_details
+from .provider import get_providers
+from .tokens import token_budget
+
+# A producer computes one state field; it can await other fields through the LazyState
+StateProducer = Callable[["LazyState"], Awaitable[Any]]
+
+
+class LazyState:
+    """
+    State whose fields are computed on first use.
+
+    Each expensive field (actors, recent messages, providers, ...) has an
+    async producer that runs at most once, however many fields or templates
+    ask for it. `compose` renders a template after resolving only the keys it
+    references, so short templates skip the database queries and provider
+    calls behind fields they never read. Template keys with neither a value
+    nor a producer are logged, since they would render empty.
+
+    Recent messages are fitted into `history_share` of the model's input
+    window (`model_settings`, by default `runtime.modelSettings`), dropping
+    attachments before whole messages; without model settings they are not
+    budgeted.
+    """
+
+    def __init__(self, runtime: IAgentRuntime, message: Memory,
+                 producers: Optional[Dict[str, StateProducer]] = None,
+                 values: Optional[Dict[str, Any]] = None,
+                 model_settings: Optional[ModelSettings] = None,
+                 history_share: float = 0.5):
+        self.runtime = runtime
+        self.message = message
+        self.model_settings = model_settings or getattr(runtime, "modelSettings", None)
+        self.history_share = history_share
+        self.producers = default_producers() if producers is None else producers
+        self.values: Dict[str, Any] = {
+            "agentId": runtime.agentId,
+            "roomId": message.roomId,
+            "userId": message.userId,
+            "agentName": runtime.character.name,
+            **(values or {})
+        }
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.values or key in self.producers
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        if key in self.values:
+            return self.values[key]
+        producer = self.producers.get(key)
+        if producer is None:
+            return default
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(producer(self))
+        value = await task
+        self.values[key] = value
+        return value
+
+    async def resolve(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Compute the given fields concurrently and return every value known so far"""
+        pending = [key for key in keys if key not in self.values and key in self.producers]
+        if pending:
+            await asyncio.gather(*[self.get(key) for key in pending])
+        return self.values
+
+    async def compose(self, template: str, templating_engine: Optional[str] = None) -> str:
+        """compose_context over just the fields `template` references"""
+        keys = template_keys(template, templating_engine)
+        values = await self.resolve(keys)
+        missing = keys - values.keys()
+        if missing:
+            # Handlebars keys over-approximate (block-local names), so only the exact engine warns
+            log = rome_logger.debug if templating_engine == "handlebars" else rome_logger.warning
+            log(f"Template keys without a value or producer: {', '.join(sorted(missing))}")
+        return compose_context(values, template, templating_engine)
+
+
+async def _actors_data(state: LazyState):
+    return await get_actor_details(state.runtime, state.message.roomId)
+
+
+async def _actors(state: LazyState) -> str:
+    return format_actors(await state.get("actorsData"))
+
+
+async def _sender_name(state: LazyState) -> Optional[str]:
+    actors = await state.get("actorsData")
+    return next((actor.name for actor in actors if actor.id == state.message.userId), None)
+
+
+async def _conversation_window(state: LazyState):
+    """(messages kept, formatted text) of the room's recent messages, fitted to the history budget"""
+    messages, actors = await asyncio.gather(
+        state.runtime.messageManager.getMemories(
+            roomId=state.message.roomId,
+            count=state.runtime.getConversationLength(),
+            unique=False
+        ),
+        state.get("actorsData")
+    )
+    if state.model_settings is None:
+        return messages, format_messages(messages, actors)
+    return build_conversation_window(messages, actors, token_budget(state.model_settings, state.history_share))
+
+
+async def _recent_messages_data(state: LazyState):
+    return (await state.get("conversationWindow"))[0]
+
+
+async def _recent_messages(state: LazyState) -> str:
+    return (await state.get("conversationWindow"))[1]
+
+
+async def _providers(state: LazyState) -> str:
+    return await get_providers(state.runtime, state.message, state.values)
+
+
+def _join(value: Any, separator: str) -> str:
+    if not value:
+        return ""
+    return value if isinstance(value, str) else separator.join(value)
+
+
+async def _bio(state: LazyState) -> str:
+    return _join(state.runtime.character.bio, " ")
+
+
+async def _lore(state: LazyState) -> str:
+    return _join(state.runtime.character.lore, "\n")
+
+
+def _directions(state: LazyState, kind: str) -> str:
+    style = state.runtime.character.style or {}
+    return _join([*style.get("all", []), *style.get(kind, [])], "\n")
+
+
+async def _message_directions(state: LazyState) -> str:
+    return _directions(state, "chat")
+
+
+async def _post_directions(state: LazyState) -> str:
+    return _directions(state, "post")
+
+
+async def _knowledge_data(state: LazyState) -> List[str]:
+    return list(state.runtime.character.knowledge or [])
+
+
+async def _knowledge(state: LazyState) -> str:
+    return _join(await state.get("knowledgeData"), "\n")
+
+
+async def _actions_data(state: LazyState):
+    """The runtime's actions whose `validate` accepts this message"""
+    valid = []
+    for action in state.runtime.actions:
+        result = action.validate(state.runtime, state.message, state.values)
+        if inspect.isawaitable(result):
+            result = await result
+        if result:
+            valid.append(action)
+    return valid
+
+
+async def _action_names(state: LazyState) -> str:
+    return format_action_names(await state.get("actionsData"))
+
+
+async def _actions(state: LazyState) -> str:
+    return format_actions(await state.get("actionsData"))
+
+
+async def _action_examples(state: LazyState) -> str:
+    return compose_action_examples(await state.get("actionsData"), 10)
+
+
+def format_goals(goals: List[Goal]) -> str:
+    """One block per goal with a checkbox line per objective"""
+    blocks = []
+    for goal in goals:
+        lines = [f"Goal: {goal.name}", f"id: {goal.id}"]
+        for objective in goal.objectives:
+            status = "DONE" if objective.completed else "IN PROGRESS"
+            lines.append(f"- [{'x' if objective.completed else ' '}] {objective.description} ({status})")
+        blocks.append("\n".join(lines))
+    return "\n".join(blocks)
+
+
+async def _goals_data(state: LazyState) -> List[Goal]:
+    return await state.runtime.databaseAdapter.get_goals({
+        'roomId': state.message.roomId,
+        'onlyInProgress': True,
+    })
+
+
+async def _goals(state: LazyState) -> str:
+    return format_goals(await state.get("goalsData"))
+
+
+async def _recent_interactions_data(state: LazyState) -> List[Memory]:
+    """Recent messages in the room exchanged between the sender and the agent"""
+    participants = {state.message.userId, state.runtime.agentId}
+    return [memory for memory in await state.get("recentMessagesData") if memory.userId in participants]
+
+
+async def _recent_interactions(state: LazyState) -> str:
+    messages, actors = await asyncio.gather(state.get("recentInteractionsData"), state.get("actorsData"))
+    return format_messages(messages, actors)
+
+
+def default_producers() -> Dict[str, StateProducer]:
+    """Producers for the built-in State fields; runtimes can add or override entries"""
+    return {
+        "bio": _bio,
+        "lore": _lore,
+        "messageDirections": _message_directions,
+        "postDirections": _post_directions,
+        "knowledgeData": _knowledge_data,
+        "knowledge": _knowledge,
+        "actorsData": _actors_data,
+        "actors": _actors,
+        "senderName": _sender_name,
+        "conversationWindow": _conversation_window,
+        "recentMessagesData": _recent_messages_data,
+        "recentMessages": _recent_messages,
+        "recentInteractionsData": _recent_interactions_data,
+        "recentInteractions": _recent_interactions,
+        "goalsData": _goals_data,
+        "goals": _goals,
+        "actionsData": _actions_data,
+        "actionNames": _action_names,
+        "actions": _actions,
+        "actionExamples": _action_examples,
+        "providers": _providers,
+    }
@@ -0,0 +1,47 @@
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+from .types import ModelSettings
+
+# Any callable mapping text to a token count, e.g. a tiktoken encoder's
+# `lambda text: len(encoding.encode(text))`
+Tokenizer = Callable[[str], int]
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate: about four bytes of UTF-8 per token"""
+    if not text:
+        return 0
+    return (len(text.encode('utf-8')) + 3) // 4
+
+
+class TokenCounter:
+    """
+    Token counter with a bounded LRU cache of counts keyed by caller-chosen
+    keys such as memory ids, so each memory is tokenized once.
+    """
+
+    def __init__(self, tokenizer: Optional[Tokenizer] = None, max_entries: int = 8192):
+        self.tokenizer = tokenizer or estimate_tokens
+        self.max_entries = max_entries
+        self._counts: "OrderedDict[Hashable, int]" = OrderedDict()
+
+    def count(self, text: str, key: Optional[Hashable] = None) -> int:
+        if key is None:
+            return self.tokenizer(text)
+        tokens = self._counts.get(key)
+        if tokens is not None:
+            self._counts.move_to_end(key)
+            return tokens
+        tokens = self._counts[key] = self.tokenizer(text)
+        if len(self._counts) > self.max_entries:
+            self._counts.popitem(last=False)
+        return tokens
+
+    def clear(self) -> None:
+        self._counts.clear()
+
+
+def token_budget(settings: ModelSettings, share: float = 0.5) -> int:
+    """Tokens of the model's input window allotted to one prompt section"""
+    return int(settings.maxInputTokens * share)
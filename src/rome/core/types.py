@@ -1,8 +1,12 @@
+import asyncio
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import List, Optional, Union, Dict, Callable, Any, Protocol
+from typing import List, Optional, Union, Dict, Callable, Any, AsyncIterator, Awaitable, Protocol, TYPE_CHECKING
 from uuid import UUID
 
+if TYPE_CHECKING:
+    from .embedding import CompactEmbedding
+
 #
 # Basic Enums
 #
@@ -179,7 +183,8 @@ class Memory:
     agentId: UUID
     createdAt: Optional[float]
     content: Content
-    embedding: Optional[List[float]]
+    # Either plain floats or a packed float32/float16/int8 CompactEmbedding
+    embedding: Optional[Union[List[float], "CompactEmbedding"]]
     roomId: UUID
     unique: Optional[bool] = False
     similarity: Optional[float] = None
@@ -224,6 +229,16 @@ class Evaluator:
 @dataclass
 class Provider:
     get: Callable[..., Any]
+    name: Optional[str] = None
+    # Seconds before ProviderExecutor gives up on this provider; None uses the executor's default
+    timeout: Optional[float] = None
+    # Seconds a result is served from runtime.cacheManager; None disables caching.
+    # Cached providers must set `name`, which namespaces their cache keys
+    cacheTtl: Optional[float] = None
+    # (runtime, message, state) -> cache key; defaults to one entry per agent and room
+    cacheKey: Optional[Callable[..., str]] = None
+    # Seconds an expired result is still served while one refresh runs in the background
+    cacheStale: Optional[float] = None
 
 @dataclass
 class Relationship:
@@ -351,6 +366,14 @@ class IDatabaseAdapter:
     async def getAccountById(self, userId: UUID) -> Optional[Account]:
         raise NotImplementedError
 
+    async def getAccountsByIds(self, userIds: List[UUID]) -> List[Account]:
+        """Accounts that exist among `userIds`; adapters with a batch query should override"""
+        accounts = await asyncio.gather(*[self.getAccountById(user_id) for user_id in userIds])
+        return [account for account in accounts if account is not None]
+
+    async def getParticipantsForRoom(self, roomId: UUID) -> List[UUID]:
+        raise NotImplementedError
+
     # Other methods omitted for brevity
 
 @dataclass
@@ -366,6 +389,26 @@ class IDatabaseCacheAdapter:
     async def deleteCache(self, agentId: UUID, key: str) -> bool:
         raise NotImplementedError
 
+    # Batched variants; backends should override these with a single round trip
+
+    async def getCacheMany(self, agentId: UUID, keys: List[str]) -> Dict[str, str]:
+        result = {}
+        for key in keys:
+            value = await self.getCache(agentId, key)
+            if value is not None:
+                result[key] = value
+        return result
+
+    async def setCacheMany(self, agentId: UUID, entries: Dict[str, str]) -> bool:
+        for key, value in entries.items():
+            await self.setCache(agentId, key, value)
+        return True
+
+    async def deleteCacheMany(self, agentId: UUID, keys: List[str]) -> bool:
+        for key in keys:
+            await self.deleteCache(agentId, key)
+        return True
+
 @dataclass
 class IMemoryManager:
     runtime: Any
@@ -382,11 +425,22 @@ class IMemoryManager:
     async def createMemory(self, memory: Memory, unique: bool = False) -> None:
         raise NotImplementedError
 
+    async def createMemories(self, memories: List[Memory], unique: bool = False) -> None:
+        raise NotImplementedError
+
+    def iterMemories(self, roomId: UUID, pageSize: int = 100, unique: bool = False,
+                     start: Optional[int] = None, end: Optional[int] = None,
+                     includeEmbeddings: bool = True) -> AsyncIterator[Memory]:
+        """Stream a room's memories newest first, one page in memory at a time"""
+        raise NotImplementedError
+
     # Other methods omitted for brevity
 
 @dataclass
 class CacheOptions:
     expires: Optional[int] = None
+    # Relative lifetime in seconds; takes precedence over `expires` when set
+    ttl: Optional[float] = None
 
 @dataclass
 class ICacheManager:
@@ -401,6 +455,31 @@ class ICacheManager:
     async def delete(self, key: str) -> None:
         raise NotImplementedError
 
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    async def set_many(self, entries: Dict[str, Any], options: Optional[CacheOptions] = None) -> None:
+        raise NotImplementedError
+
+    async def delete_many(self, keys: List[str]) -> None:
+        raise NotImplementedError
+
+    async def get_or_compute(self, key: str, factory: Callable[[], Awaitable[Any]],
+                             options: Optional[CacheOptions] = None,
+                             stale_while_revalidate: Optional[float] = None) -> Any:
+        """
+        Cached value for `key`, computed with `factory` and stored on a miss.
+
+        This default neither shares concurrent computations nor serves stale
+        entries; implementations should override it to do both.
+        """
+        value = await self.get(key)
+        if value is None:
+            value = await factory()
+            if value is not None:
+                await self.set(key, value, options)
+        return value
+
 @dataclass
 class KnowledgeItem:
     id: UUID
@@ -535,6 +614,13 @@ class IAgentRuntime:
     knowledgeManager: IMemoryManager = None
     loreManager: IMemoryManager = None
     cacheManager: ICacheManager = None
+    # Room participant / actor cache used by get_actor_details; invalidated by
+    # ensureParticipantInRoom and account updates
+    actorCache: Any = None
+    # ProviderExecutor used by get_providers; None runs providers without deadlines
+    providerExecutor: Any = None
+    # Settings of the model prompts are composed for; bounds sections such as recentMessages
+    modelSettings: Optional[ModelSettings] = None
     services: Dict[ServiceType, Service] = field(default_factory=dict)
     clients: Dict[str, Any] = field(default_factory=dict)
 
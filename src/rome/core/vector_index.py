@@ -0,0 +1,254 @@
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .embedding import DTYPES, quantize
+
+# Rows dequantized per block when scoring float16/int8 matrices, bounding the
+# temporary float32 copy
+SCORE_BLOCK = 65536
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length so a dot product is cosine similarity"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k highest scores, best first, via a partial sort"""
+    if k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.size:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.size)
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+class _Codes:
+    """Maps hashable labels such as room ids to small integer codes"""
+
+    def __init__(self):
+        self._codes: Dict[Hashable, int] = {}
+
+    def encode(self, label: Optional[Hashable]) -> int:
+        if label is None:
+            return -1
+        code = self._codes.get(label)
+        if code is None:
+            code = self._codes[label] = len(self._codes)
+        return code
+
+    def lookup(self, label: Hashable) -> Optional[int]:
+        return self._codes.get(label)
+
+    def labels(self) -> List[Hashable]:
+        """Labels in code order"""
+        return list(self._codes)
+
+
+class VectorIndex:
+    """
+    Exact in-memory cosine index over one contiguous float32 matrix.
+
+    Rows are unit-normalised on insert so a query is scored against every row
+    with a single matrix-vector product; rows can be filtered by room, agent
+    and uniqueness before the top-k partial sort. With `dtype` 'float16' or
+    'int8' the matrix is stored quantized (int8 with a per-row scale) and
+    scored directly from that storage, block by block.
+    """
+
+    def __init__(self, dim: Optional[int] = None, capacity: int = 1024, dtype: str = 'float32'):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported embedding dtype: {dtype}")
+        self.dim = dim
+        self.dtype = dtype
+        self._capacity = capacity
+        self._size = 0
+        self._matrix: Optional[np.ndarray] = None
+        self._rooms = np.empty(0, dtype=np.int32)
+        self._agents = np.empty(0, dtype=np.int32)
+        self._unique = np.empty(0, dtype=bool)
+        self._scales = np.empty(0, dtype=np.float32)
+        self._ids: List[Hashable] = []
+        self._rows: Dict[Hashable, int] = {}
+        self._room_codes = _Codes()
+        self._agent_codes = _Codes()
+        if dim is not None:
+            self._allocate(dim, capacity)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, id_: Hashable) -> bool:
+        return id_ in self._rows
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """View of the live rows in their stored dtype"""
+        if self._matrix is None:
+            return np.empty((0, self.dim or 0), dtype=DTYPES[self.dtype][1])
+        return self._matrix[:self._size]
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes + self._scales[:self._size].nbytes
+
+    def _allocate(self, dim: int, capacity: int) -> None:
+        self.dim = dim
+        self._matrix = np.zeros((capacity, dim), dtype=DTYPES[self.dtype][1])
+        self._scales = np.ones(capacity, dtype=np.float32)
+        self._rooms = np.full(capacity, -1, dtype=np.int32)
+        self._agents = np.full(capacity, -1, dtype=np.int32)
+        self._unique = np.ones(capacity, dtype=bool)
+        self._capacity = capacity
+
+    def _grow(self, needed: int) -> None:
+        capacity = self._capacity
+        while capacity < needed:
+            capacity *= 2
+        if capacity == self._capacity:
+            return
+        matrix = np.zeros((capacity, self.dim), dtype=self._matrix.dtype)
+        matrix[:self._size] = self._matrix[:self._size]
+        self._matrix = matrix
+        self._scales = np.resize(self._scales, capacity)
+        self._rooms = np.resize(self._rooms, capacity)
+        self._agents = np.resize(self._agents, capacity)
+        self._unique = np.resize(self._unique, capacity)
+        self._capacity = capacity
+
+    def add(self, id_: Hashable, embedding: Sequence[float], room_id: Optional[Hashable] = None,
+            agent_id: Optional[Hashable] = None, unique: bool = True) -> None:
+        self.add_many([(id_, embedding, room_id, agent_id, unique)])
+
+    def add_many(self, items: Iterable[Tuple[Hashable, Sequence[float], Optional[Hashable],
+                                             Optional[Hashable], bool]]) -> None:
+        items = list(items)
+        if not items:
+            return
+        vectors = normalize(np.asarray([item[1] for item in items], dtype=np.float32))
+        if self._matrix is None:
+            # Headroom so the inserts that follow a bulk load do not immediately copy the matrix
+            self._allocate(vectors.shape[1], max(self._capacity, 2 * len(items)))
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index dimension {self.dim}")
+        self._grow(self._size + len(items))
+        values, scales = quantize(vectors, self.dtype)
+        for (id_, _, room_id, agent_id, unique), vector, scale in zip(items, values, scales):
+            row = self._rows.get(id_)
+            if row is None:
+                row = self._size
+                self._size += 1
+                self._ids.append(id_)
+                self._rows[id_] = row
+            self._matrix[row] = vector
+            self._scales[row] = scale
+            self._rooms[row] = self._room_codes.encode(room_id)
+            self._agents[row] = self._agent_codes.encode(agent_id)
+            self._unique[row] = unique
+
+    def remove(self, id_: Hashable) -> bool:
+        """Delete a row by moving the last row into its slot"""
+        row = self._rows.pop(id_, None)
+        if row is None:
+            return False
+        last = self._size - 1
+        if row != last:
+            moved = self._ids[last]
+            self._matrix[row] = self._matrix[last]
+            self._scales[row] = self._scales[last]
+            self._rooms[row] = self._rooms[last]
+            self._agents[row] = self._agents[last]
+            self._unique[row] = self._unique[last]
+            self._ids[row] = moved
+            self._rows[moved] = row
+        self._ids.pop()
+        self._size = last
+        return True
+
+    def _vectors(self, rows: np.ndarray) -> np.ndarray:
+        """Dequantized float32 copies of the given rows"""
+        vectors = self._matrix[rows].astype(np.float32)
+        if self.dtype == 'int8':
+            vectors *= self._scales[rows, None]
+        return vectors
+
+    def _score(self, q: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Cosine scores of `q` against the given rows, or all live rows"""
+        if self.dtype == 'float32':
+            return (self.matrix if rows is None else self._matrix[rows]) @ q
+        count = self._size if rows is None else rows.size
+        scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, SCORE_BLOCK):
+            end = min(start + SCORE_BLOCK, count)
+            block = slice(start, end) if rows is None else rows[start:end]
+            scores[start:end] = self._matrix[block].astype(np.float32) @ q
+            if self.dtype == 'int8':
+                scores[start:end] *= self._scales[block]
+        return scores
+
+    def _mask(self, room_id: Optional[Hashable], agent_id: Optional[Hashable],
+              unique: bool) -> Optional[np.ndarray]:
+        mask = None
+        for label, codes, column in ((room_id, self._room_codes, self._rooms),
+                                     (agent_id, self._agent_codes, self._agents)):
+            if label is None:
+                continue
+            code = codes.lookup(label)
+            if code is None:
+                return np.zeros(self._size, dtype=bool)
+            selected = column[:self._size] == code
+            mask = selected if mask is None else mask & selected
+        if unique:
+            selected = self._unique[:self._size]
+            mask = selected if mask is None else mask & selected
+        return mask
+
+    def _candidate_rows(self, candidates: Iterable[Hashable]) -> np.ndarray:
+        return np.fromiter((self._rows[id_] for id_ in candidates if id_ in self._rows), dtype=np.int64)
+
+    def search(self, query: Sequence[float], k: int = 10, room_id: Optional[Hashable] = None,
+               agent_id: Optional[Hashable] = None, threshold: Optional[float] = None,
+               unique: bool = False,
+               candidates: Optional[Iterable[Hashable]] = None) -> List[Tuple[Hashable, float]]:
+        """
+        Return up to k (id, cosine similarity) pairs, most similar first.
+
+        `candidates` restricts scoring to those ids, e.g. a lexical prefilter.
+        """
+        if self._size == 0:
+            return []
+        q = normalize(np.asarray(query, dtype=np.float32))
+        if q.shape[0] != self.dim:
+            raise ValueError(f"Query dimension {q.shape[0]} does not match index dimension {self.dim}")
+        mask = self._mask(room_id, agent_id, unique)
+        if candidates is not None:
+            rows = self._candidate_rows(candidates)
+            if mask is not None:
+                rows = rows[mask[rows]]
+            if rows.size == 0:
+                return []
+            scores = self._score(q, rows)
+        elif mask is None:
+            rows = None
+            scores = self._score(q)
+        else:
+            rows = np.flatnonzero(mask)
+            if rows.size == 0:
+                return []
+            # Gathering a small subset is cheaper than scoring every row
+            if rows.size * 4 < self._size:
+                scores = self._score(q, rows)
+            else:
+                scores = self._score(q)[rows]
+        if threshold is not None:
+            keep = np.flatnonzero(scores >= threshold)
+            scores = scores[keep]
+            rows = keep if rows is None else rows[keep]
+        best = top_k(scores, k)
+        positions = best if rows is None else rows[best]
+        return [(self._ids[p], float(scores[b])) for p, b in zip(positions, best)]